@@ -0,0 +1,75 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+
+CATALOGUE_VERSION_KEY = "book:catalogue:version"
+
+
+def _book_version_key(book_id) -> str:
+    return f"book:{book_id}:version"
+
+
+def _get_version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        # A fresh, time based value never collides with
+        # entries written under an evicted version.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def _request_digest(request) -> str:
+    """Hash query params independently of their order in the URL.
+
+    Scheme and host are part of it because pagination links are absolute.
+    """
+    query_params = request.query_params
+    items = sorted(
+        (key, value)
+        for key in query_params
+        for value in query_params.getlist(key)
+    )
+    raw = f"{request.build_absolute_uri('/')}?{urlencode(items)}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def list_cache_key(request) -> str:
+    version = _get_version(CATALOGUE_VERSION_KEY)
+    return f"book:list:{version}:{_request_digest(request)}"
+
+
+def detail_cache_key(request, book_id) -> str:
+    version = _get_version(_book_version_key(book_id))
+    return f"book:detail:{book_id}:{version}:{_request_digest(request)}"
+
+
+def get_cached(key: str):
+    return cache.get(key)
+
+
+def set_cached(key: str, data) -> None:
+    cache.set(key, data, timeout=settings.BOOK_CACHE_TIMEOUT)
+
+
+def invalidate_book(book_id, catalogue: bool = True) -> None:
+    """Drop cached responses for a book.
+
+    Detail responses of the book are always invalidated, list responses
+    only when ``catalogue`` is set (the list does not show inventory).
+    """
+    if book_id is not None:
+        _bump_version(_book_version_key(book_id))
+    if catalogue:
+        _bump_version(CATALOGUE_VERSION_KEY)
@@ -0,0 +1,74 @@
+from rest_framework import serializers
+
+from book.cache import invalidate_book
+from book.models import Book
+from book.serializers import BookImportSerializer
+from library_api.streaming import chunked
+
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+UPSERT_FIELDS = ("cover", "inventory", "daily_fee", "updated_at")
+
+
+def import_books(records, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Validate and upsert books from ``(line_number, record, error)`` rows.
+
+    Rows are processed ``chunk_size`` at a time, each chunk with a single
+    ``INSERT ... ON CONFLICT`` on the natural key (title, author), so memory
+    use does not depend on the size of the feed and concurrent imports
+    cannot create the same book twice.
+    """
+    report = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+
+    for chunk in chunked(records, chunk_size):
+        _import_chunk(chunk, report)
+
+    if report["created"] or report["updated"]:
+        invalidate_book(None)
+    return report
+
+
+def _import_chunk(chunk, report: dict) -> None:
+    validator = BookImportSerializer()
+    books = {}
+
+    for line_number, record, error in chunk:
+        if error is None:
+            try:
+                data = validator.run_validation(record)
+            except serializers.ValidationError as exc:
+                error = exc.detail
+            else:
+                books[(data["title"], data["author"])] = data
+                continue
+
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_number, "errors": error})
+
+    if not books:
+        return
+
+    # Only tells created from updated rows in the report, the upsert
+    # itself does not depend on it.
+    existing = set(
+        Book.objects.filter(
+            title__in={title for title, _ in books},
+            author__in={author for _, author in books},
+        ).values_list("title", "author")
+    ) & books.keys()
+
+    upserted = Book.objects.bulk_create(
+        [Book(**data) for data in books.values()],
+        update_conflicts=True,
+        unique_fields=("title", "author"),
+        update_fields=UPSERT_FIELDS,
+    )
+
+    for book in upserted:
+        if (book.title, book.author) in existing:
+            invalidate_book(book.pk, catalogue=False)
+
+    report["created"] += len(books) - len(existing)
+    report["updated"] += len(existing)
@@ -0,0 +1,153 @@
+"""Race-free reservation of book copies.
+
+Every change is a single conditional UPDATE
+(``inventory = inventory - 1 WHERE inventory > 0``), so concurrent
+checkouts can neither oversell nor lose updates.
+
+Hot titles can be switched to striped mode: the available copies are split
+across ``InventoryStripe`` rows and each checkout locks one random stripe
+with ``FOR UPDATE SKIP LOCKED``, so concurrent checkouts of the same title
+rarely wait on each other. ``Book.inventory`` of a striped book is a
+snapshot refreshed by ``sync_striped_inventory``.
+"""
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Now
+
+from book.cache import invalidate_book
+from book.models import Book, InventoryStripe
+
+
+STRIPE_ATTEMPTS = 3
+
+
+def reserve_copy(book: Book) -> bool:
+    """Take one copy of the book, return False if none is available"""
+    with transaction.atomic():
+        if book.inventory_stripes:
+            reserved = _update_stripe(book, -1)
+        else:
+            reserved = Book.objects.filter(
+                pk=book.pk, inventory__gt=0, inventory_stripes=0
+            ).update(inventory=F("inventory") - 1, updated_at=Now())
+            if not reserved:
+                # Out of copies, or striping was enabled meanwhile.
+                reserved = _reserve_locked(book)
+        if reserved:
+            _invalidate_on_commit(book)
+    return bool(reserved)
+
+
+def release_copy(book: Book) -> None:
+    """Put one copy of the book back"""
+    with transaction.atomic():
+        if book.inventory_stripes:
+            released = _update_stripe(book, 1)
+        else:
+            released = Book.objects.filter(
+                pk=book.pk, inventory_stripes=0
+            ).update(inventory=F("inventory") + 1, updated_at=Now())
+        if not released:
+            # Striping changed meanwhile, or no stripe could be taken.
+            _release_locked(book)
+        _invalidate_on_commit(book)
+
+
+def enable_striping(book: Book, stripes: int) -> None:
+    """Spread the available copies of a hot book across ``stripes`` rows"""
+    with transaction.atomic():
+        locked = Book.objects.select_for_update().get(pk=book.pk)
+        if locked.inventory_stripes:
+            return
+        share, remainder = divmod(locked.inventory, stripes)
+        InventoryStripe.objects.bulk_create(
+            InventoryStripe(
+                book=locked,
+                stripe=index,
+                available=share + (index < remainder),
+            )
+            for index in range(stripes)
+        )
+        Book.objects.filter(pk=book.pk).update(inventory_stripes=stripes)
+    book.inventory_stripes = stripes
+
+
+def disable_striping(book: Book) -> None:
+    """Fold the stripes of a book back into ``Book.inventory``"""
+    with transaction.atomic():
+        locked = Book.objects.select_for_update().get(pk=book.pk)
+        stripes = InventoryStripe.objects.select_for_update().filter(
+            book=locked
+        )
+        available = sum(stripe.available for stripe in stripes)
+        stripes.delete()
+        Book.objects.filter(pk=book.pk).update(
+            inventory=available, inventory_stripes=0, updated_at=Now()
+        )
+        _invalidate_on_commit(book)
+    book.inventory_stripes = 0
+
+
+def sync_striped_inventory() -> int:
+    """Refresh ``Book.inventory`` of striped books from their stripes"""
+    totals = InventoryStripe.objects.filter(
+        book=OuterRef("pk")
+    ).values("book").annotate(total=Sum("available")).values("total")
+    books = Book.objects.filter(inventory_stripes__gt=0)
+    book_ids = list(books.values_list("pk", flat=True))
+    updated = books.update(
+        inventory=Coalesce(Subquery(totals), 0), updated_at=Now()
+    )
+    for book_id in book_ids:
+        invalidate_book(book_id, catalogue=False)
+    return updated
+
+
+def _update_stripe(book: Book, delta: int) -> int:
+    candidates = InventoryStripe.objects.filter(book_id=book.pk)
+    if delta < 0:
+        candidates = candidates.filter(available__gt=0)
+
+    # The first attempt only considers stripes nobody holds, the next ones
+    # wait for a lock as long as some stripe still has copies.
+    for attempt in range(STRIPE_ATTEMPTS):
+        skip_locked = attempt == 0
+        stripe = (
+            candidates.order_by("?")
+            .select_for_update(skip_locked=skip_locked)
+            .values("pk")[:1]
+        )
+        updated = InventoryStripe.objects.filter(
+            pk__in=Subquery(stripe), available__gte=-delta
+        ).update(available=F("available") + delta)
+        if updated or not candidates.exists():
+            return updated
+    return 0
+
+
+def _reserve_locked(book: Book) -> int:
+    """Retry a missed plain reservation with the book row locked"""
+    locked = Book.objects.select_for_update().get(pk=book.pk)
+    book.inventory_stripes = locked.inventory_stripes
+    if locked.inventory_stripes:
+        return _update_stripe(book, -1)
+    return 0
+
+
+def _release_locked(book: Book) -> None:
+    """Put a copy back while holding the book row, which striping locks"""
+    locked = Book.objects.select_for_update().get(pk=book.pk)
+    if locked.inventory_stripes:
+        stripe = InventoryStripe.objects.filter(book=locked).order_by("stripe")
+        InventoryStripe.objects.filter(
+            pk__in=Subquery(stripe.values("pk")[:1])
+        ).update(available=F("available") + 1)
+    else:
+        Book.objects.filter(pk=book.pk).update(
+            inventory=F("inventory") + 1, updated_at=Now()
+        )
+    book.inventory_stripes = locked.inventory_stripes
+
+
+def _invalidate_on_commit(book: Book) -> None:
+    transaction.on_commit(lambda: invalidate_book(book.pk, catalogue=False))
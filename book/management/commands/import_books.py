@@ -0,0 +1,47 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from book.importer import CHUNK_SIZE, import_books
+from library_api.streaming import CSV, NDJSON, iter_lines, iter_records
+
+
+class Command(BaseCommand):
+    """Django command that upserts books from a CSV or NDJSON file"""
+
+    help = "Import books from a CSV or NDJSON file, matched by title+author"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path)
+        parser.add_argument(
+            "--format",
+            choices=[CSV, NDJSON],
+            help="File format, guessed from the extension by default",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        path = options["path"]
+        data_format = options["format"] or (
+            CSV if path.suffix.lower() == ".csv" else NDJSON
+        )
+        if not path.exists():
+            raise CommandError(f"File {path} does not exist")
+
+        with path.open("rb") as stream:
+            report = import_books(
+                iter_records(iter_lines(stream), data_format),
+                chunk_size=options["chunk_size"],
+            )
+
+        for error in report["errors"]:
+            self.stderr.write(
+                f"Line {error['line']}: {json.dumps(error['errors'])}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created: {report['created']}, "
+            f"updated: {report['updated']}, "
+            f"failed: {report['failed']}"
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book.inventory import disable_striping, enable_striping
+from book.models import Book
+
+
+class Command(BaseCommand):
+    """Django command that switches inventory striping of hot books"""
+
+    help = (
+        "Spread the copies of a book across inventory stripes, so "
+        "concurrent checkouts of it rarely wait on each other"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("book_ids", nargs="+", type=int)
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument(
+            "--stripes", type=int, help="Number of stripes to split into"
+        )
+        group.add_argument(
+            "--disable",
+            action="store_true",
+            help="Fold the stripes back into the book inventory",
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if options["stripes"] is not None and options["stripes"] < 2:
+            raise CommandError("--stripes must be at least 2")
+
+        books = Book.objects.in_bulk(options["book_ids"])
+        missing = set(options["book_ids"]) - set(books)
+        if missing:
+            raise CommandError(
+                f"No books with ids {', '.join(map(str, sorted(missing)))}"
+            )
+
+        for book in books.values():
+            if options["disable"]:
+                disable_striping(book)
+            else:
+                enable_striping(book, options["stripes"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{book.title}: {book.inventory_stripes or 'no'} stripes"
+            ))
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:30
+
+from django.db import migrations
+
+TASK_NAME = "Sync striped book inventory"
+
+
+def schedule_sync(apps, schema_editor):
+    IntervalSchedule = apps.get_model("django_celery_beat", "IntervalSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    interval, _ = IntervalSchedule.objects.get_or_create(
+        every=1, period="minutes"
+    )
+    PeriodicTask.objects.update_or_create(
+        name=TASK_NAME,
+        defaults={
+            "task": "book.tasks.sync_striped_inventory",
+            "interval": interval,
+        },
+    )
+
+
+def unschedule_sync(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book", "0005_inventory_stripes"),
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_sync, unschedule_sync),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:23
+
+from django.db import migrations, models
+
+
+def merge_duplicate_books(apps, schema_editor):
+    """Fold books sharing a title and author into the oldest one"""
+    Book = apps.get_model("book", "Book")
+    Borrowing = apps.get_model("borrowing", "Borrowing")
+    InventoryStripe = apps.get_model("book", "InventoryStripe")
+
+    def copies(book):
+        if book.inventory_stripes:
+            return InventoryStripe.objects.filter(book=book).aggregate(
+                total=models.Sum("available")
+            )["total"] or 0
+        return book.inventory
+
+    duplicates = (
+        Book.objects.values("title", "author")
+        .annotate(count=models.Count("id"), keep=models.Min("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        kept = Book.objects.get(pk=duplicate["keep"])
+        extra = Book.objects.filter(
+            title=duplicate["title"], author=duplicate["author"]
+        ).exclude(pk=kept.pk)
+        added = sum(copies(book) for book in extra)
+
+        if kept.inventory_stripes:
+            InventoryStripe.objects.filter(book=kept, stripe=0).update(
+                available=models.F("available") + added
+            )
+        Book.objects.filter(pk=kept.pk).update(
+            inventory=models.F("inventory") + added
+        )
+        Borrowing.objects.filter(book__in=extra).update(book=kept)
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book", "0006_sync_striped_inventory_schedule"),
+        ("borrowing", "0010_outbox_claimed_until"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_books, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="book",
+            constraint=models.UniqueConstraint(
+                fields=("title", "author"), name="book_title_author_unique"
+            ),
+        ),
+    ]
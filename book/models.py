@@ -1,4 +1,10 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
+
+
+SEARCH_CONFIG = "english"
 
 
 class Book(models.Model):
@@ -10,7 +16,61 @@ class Book(models.Model):
     author = models.CharField(max_length=256)
     cover = models.CharField(max_length=50, choices=CoverChoices.choices)
     inventory = models.PositiveIntegerField(default=0)
+    inventory_stripes = models.PositiveSmallIntegerField(default=0)
     daily_fee = models.DecimalField(decimal_places=2, max_digits=7)
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("author", weight="B", config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        constraints = [
+            # The natural key imports are matched on.
+            models.UniqueConstraint(
+                fields=["title", "author"], name="book_title_author_unique"
+            ),
+        ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="book_search_vector_idx"),
+            # `icontains` compiles to UPPER(column) LIKE UPPER(%s),
+            # so the trigram indexes are built on the same expression.
+            GinIndex(
+                OpClass(Upper("title"), name="gin_trgm_ops"),
+                name="book_title_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("author"), name="gin_trgm_ops"),
+                name="book_author_trgm_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - author: {self.author}"
+
+
+class InventoryStripe(models.Model):
+    """A slice of a hot book's inventory (see book.inventory)"""
+
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="stripes",
+    )
+    stripe = models.PositiveSmallIntegerField()
+    available = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "stripe"],
+                name="inventory_stripe_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} #{self.stripe}: {self.available}"
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 
 from book.models import Book
+from library_api.dynamic_fields import DynamicFieldsMixin
+from library_api.fast_serializers import ValuesSerializer
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ("id", "title", "author", "cover", "inventory", "daily_fee",)
@@ -13,3 +15,19 @@ class BookListSerializer(BookSerializer):
     class Meta:
         model = Book
         fields = ("id", "title", "author",)
+
+
+class BookListValuesSerializer(ValuesSerializer):
+    fields = (
+        ("id", "id", None),
+        ("title", "title", None),
+        ("author", "author", None),
+    )
+
+
+class BookImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Book
+        fields = ("title", "author", "cover", "inventory", "daily_fee",)
+        # Existing books are updated, not rejected as duplicates.
+        validators = []
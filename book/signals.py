@@ -0,0 +1,30 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from book.cache import invalidate_book
+from book.models import Book
+
+
+INVENTORY_ONLY = frozenset({"inventory", "updated_at"})
+
+
+# Bumped before commit, the version could be refilled with the old row.
+@receiver(post_save, sender=Book)
+def invalidate_saved_book(
+    sender, instance, created, update_fields, using, **kwargs
+):
+    catalogue = created or update_fields is None or (
+        not frozenset(update_fields) <= INVENTORY_ONLY
+    )
+    transaction.on_commit(
+        partial(invalidate_book, instance.pk, catalogue=catalogue),
+        using=using,
+    )
+
+
+@receiver(post_delete, sender=Book)
+def invalidate_deleted_book(sender, instance, using, **kwargs):
+    transaction.on_commit(partial(invalidate_book, instance.pk), using=using)
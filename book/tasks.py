@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from book import inventory
+
+
+@shared_task
+def sync_striped_inventory():
+    inventory.sync_striped_inventory()
@@ -1,18 +1,112 @@
-from rest_framework import viewsets
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     extend_schema,
     OpenApiParameter,
 )
 from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
 
-from book.models import Book
-from book.serializers import BookSerializer, BookListSerializer
+from book.cache import (
+    detail_cache_key,
+    get_cached,
+    list_cache_key,
+    set_cached,
+)
+from book.importer import import_books
+from book.models import Book, SEARCH_CONFIG
+from book.serializers import (
+    BookSerializer,
+    BookListSerializer,
+    BookListValuesSerializer,
+)
+from library_api.conditional import ConditionalGetMixin
+from library_api.dynamic_fields import DynamicFieldsViewMixin
+from library_api.export import ExportMixin
+from library_api.fast_serializers import FastListMixin
+from library_api.streaming import (
+    format_from_content_type,
+    iter_lines,
+    iter_records,
+)
+
+
+class CatalogueCacheMixin:
+    """Serve list/retrieve responses from the cache (see book.cache).
+
+    The validators of a response are cached with it, so conditional
+    requests hitting the cache are answered without touching the database.
+    """
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(request)
+        return self._cached_response(
+            key, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        key = detail_cache_key(request, kwargs["pk"])
+        return self._cached_response(
+            key, super().retrieve, request, *args, **kwargs
+        )
+
+    @staticmethod
+    def _cached_response(key, handler, request, *args, **kwargs):
+        cached = get_cached(key)
+        if cached is not None:
+            data, validators = cached
+            last_modified = validators.get("Last-Modified")
+            not_modified = get_conditional_response(
+                request,
+                etag=validators.get("ETag"),
+                last_modified=last_modified and parse_http_date(last_modified),
+            )
+            if not_modified is not None:
+                return not_modified
+            return Response(data, headers=validators)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            validators = {
+                header: response[header]
+                for header in ("ETag", "Last-Modified")
+                if header in response
+            }
+            set_cached(key, (response.data, validators))
+        return response
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(
+    CatalogueCacheMixin,
+    ConditionalGetMixin,
+    FastListMixin,
+    DynamicFieldsViewMixin,
+    ExportMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    fast_list_serializer = BookListValuesSerializer
+    pagination_ordering = ("id",)
+    export_fields = (
+        "id",
+        "title",
+        "author",
+        "cover",
+        "inventory",
+        "daily_fee",
+        "updated_at",
+    )
+    export_filename = "books"
+    # Queries per action, including the JWT user lookup on a cache miss.
+    query_budgets = {"list": 3, "retrieve": 3}
 
     def get_permissions(self):
         if self.action in ["list", "retrieve"]:
@@ -25,6 +119,11 @@ class BookViewSet(viewsets.ModelViewSet):
             return BookListSerializer
         return BookSerializer
 
+    def get_pagination_ordering(self):
+        if self.request.query_params.get("q"):
+            return "-rank", "id"
+        return self.pagination_ordering
+
     @staticmethod
     def _params_to_ints(query_sting):
         """Convert a string of format '1,2,3' to a list of integers [1,2,3]"""
@@ -34,12 +133,26 @@ class BookViewSet(viewsets.ModelViewSet):
         queryset = self.queryset
         title = self.request.query_params.get("title")
         author = self.request.query_params.get("author")
+        search = self.request.query_params.get("q")
 
         if title:
             queryset = queryset.filter(title__icontains=title)
         if author:
             queryset = queryset.filter(author__icontains=author)
-        return queryset.distinct()
+        if search:
+            query = SearchQuery(
+                search, config=SEARCH_CONFIG, search_type="websearch"
+            )
+            queryset = (
+                queryset.filter(search_vector=query)
+                # ts_rank is a real, widened so that the rank stored in a
+                # pagination cursor compares equal to the row's again.
+                .annotate(rank=Cast(
+                    SearchRank(F("search_vector"), query), FloatField()
+                ))
+                .order_by("-rank", "id")
+            )
+        return self.optimize_queryset(queryset)
 
     @extend_schema(
         parameters=[
@@ -52,8 +165,35 @@ class BookViewSet(viewsets.ModelViewSet):
                 name="author",
                 type=OpenApiTypes.STR,
                 description="Filtering by author (ex. ?author=Name)",
-            )
+            ),
+            OpenApiParameter(
+                name="q",
+                type=OpenApiTypes.STR,
+                description="Full-text search by title and author, "
+                            "ordered by relevance (ex. ?q=war peace)",
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        summary="Bulk import books",
+        description="Admin can upsert books (matched by title and author) "
+                    "from a streamed CSV or NDJSON body",
+        request={
+            "text/csv": OpenApiTypes.STR,
+            "application/x-ndjson": OpenApiTypes.STR,
+        },
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=["POST"], url_path="import")
+    def bulk_import(self, request):
+        data_format = format_from_content_type(request.content_type)
+        if data_format is None:
+            raise UnsupportedMediaType(request.content_type)
+
+        stream = request.stream
+        lines = iter_lines(stream) if stream is not None else iter(())
+        report = import_books(iter_records(lines, data_format))
+        return Response(report, status=status.HTTP_200_OK)
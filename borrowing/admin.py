@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from borrowing.models import Borrowing
+from borrowing.models import Borrowing, OutboxEvent
 
 
 admin.site.register(Borrowing)
+admin.site.register(OutboxEvent)
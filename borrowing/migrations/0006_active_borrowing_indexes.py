@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book", "0005_inventory_stripes"),
+        ("borrowing", "0005_outbox_event"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(("actual_return__isnull", True)),
+                fields=["user", "-borrow_date", "-id"],
+                name="borrowing_active_user_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(("actual_return__isnull", True)),
+                fields=["expected_return"],
+                name="borrowing_active_due_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book", "0005_inventory_stripes"),
+        ("borrowing", "0006_active_borrowing_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="borrowing",
+            name="borrowing_active_due_idx",
+        ),
+        migrations.AddField(
+            model_name="borrowing",
+            name="overdue_notified_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(
+                    ("actual_return__isnull", True),
+                    ("overdue_notified_at__isnull", True),
+                ),
+                fields=["expected_return", "id"],
+                name="borrowing_overdue_queue_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+def snapshot_daily_fee(apps, schema_editor):
+    Book = apps.get_model("book", "Book")
+    Borrowing = apps.get_model("borrowing", "Borrowing")
+    Borrowing.objects.update(
+        daily_fee=models.Subquery(
+            Book.objects.filter(pk=models.OuterRef("book_id")).values(
+                "daily_fee"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing", "0007_overdue_queue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="borrowing",
+            name="daily_fee",
+            field=models.DecimalField(
+                decimal_places=2, max_digits=7, null=True
+            ),
+        ),
+        migrations.RunPython(snapshot_daily_fee, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="borrowing",
+            name="daily_fee",
+            field=models.DecimalField(decimal_places=2, max_digits=7),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:40
+
+from django.db import migrations
+
+TASK_NAME = "Dispatch borrowing outbox"
+
+
+def schedule_dispatch(apps, schema_editor):
+    IntervalSchedule = apps.get_model("django_celery_beat", "IntervalSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    interval, _ = IntervalSchedule.objects.get_or_create(
+        every=1, period="minutes"
+    )
+    PeriodicTask.objects.update_or_create(
+        name=TASK_NAME,
+        defaults={
+            "task": "borrowing.tasks.dispatch_outbox",
+            "interval": interval,
+        },
+    )
+
+
+def unschedule_dispatch(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing", "0008_borrowing_daily_fee"),
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_dispatch, unschedule_dispatch),
+    ]
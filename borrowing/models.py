@@ -21,10 +21,63 @@ class Borrowing(models.Model):
         on_delete=models.CASCADE,
         related_name="borrowings",
     )
+    # Snapshot of book.daily_fee when the book was borrowed.
+    daily_fee = models.DecimalField(decimal_places=2, max_digits=7)
+    overdue_notified_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-borrow_date", "-id"],
+                name="borrowing_borrow_date_id_idx",
+            ),
+            models.Index(
+                fields=["user", "-borrow_date", "-id"],
+                name="borrowing_user_date_id_idx",
+            ),
+            models.Index(
+                fields=["user", "-borrow_date", "-id"],
+                name="borrowing_active_user_idx",
+                condition=models.Q(actual_return__isnull=True),
+            ),
+            # Due queue: open borrowings nobody was notified about yet.
+            models.Index(
+                fields=["expected_return", "id"],
+                name="borrowing_overdue_queue_idx",
+                condition=models.Q(
+                    actual_return__isnull=True,
+                    overdue_notified_at__isnull=True,
+                ),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.book.title} - {self.expected_return}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_expected_return = instance.__dict__.get(
+            "expected_return"
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.daily_fee is None:
+            self.daily_fee = self.book.daily_fee
+        # A new due date puts the borrowing back in the overdue queue.
+        loaded = getattr(self, "_loaded_expected_return", None)
+        if loaded is not None and loaded != self.expected_return:
+            self.overdue_notified_at = None
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields, "overdue_notified_at"
+                }
+        super().save(*args, **kwargs)
+        self._loaded_expected_return = self.expected_return
+
     @property
     def is_active(self):
         return self.actual_return is None
@@ -38,3 +91,34 @@ class Borrowing(models.Model):
             raise ValidationError(
                 f"Actual return date must be after {self.borrow_date}"
             )
+
+
+class OutboxEvent(models.Model):
+    """Side effect recorded in the transaction that caused it.
+
+    Rows are drained by the ``dispatch_outbox`` task after commit.
+    """
+
+    class KindChoices(models.TextChoices):
+        PAYMENT_SESSION = "PAYMENT_SESSION"
+        TELEGRAM_MESSAGE = "TELEGRAM_MESSAGE"
+
+    kind = models.CharField(max_length=30, choices=KindChoices.choices)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="outbox_pending_idx",
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id}"
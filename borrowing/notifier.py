@@ -0,0 +1,258 @@
+"""Long-lived Telegram notifier.
+
+One ``TelegramNotifier`` per process owns a pooled HTTP session to the Bot
+API and a background worker thread. ``enqueue()`` only puts the message on
+a queue; the worker coalesces messages sent to a chat within ``window``
+seconds into one, waits for a token of that chat's bucket (Telegram
+allows about 20 messages a minute in a group) and sends it, retrying
+transient failures (after ``retry_after`` when Telegram answers 429).
+Fire-and-forget callers (the outbox, the overdue digests) go through
+``send_telegram_message``, Celery tasks ``flush()`` before returning so
+their messages are not lost with the worker. ``send()`` goes through the
+same bucket and session but blocks and raises, for callers that retry on
+their own.
+
+Plain blocking HTTP in a thread works the same under the prefork and the
+eventlet worker pools, unlike a per-message ``asyncio.run``.
+"""
+import logging
+import queue
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+TIMEOUT = (3.05, 10)
+# Telegram rejects messages longer than 4096 characters.
+MAX_MESSAGE_LENGTH = 4096
+COALESCE_WINDOW = 0.5
+MESSAGES_PER_MINUTE = 20
+BURST = 5
+SEND_ATTEMPTS = 3
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, return how long to wait before using it"""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.rate,
+            )
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def hold(self, seconds: float) -> None:
+        """Make the next token available in ``seconds`` at the earliest"""
+        with self._lock:
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class TelegramError(Exception):
+    """A failed Bot API call, ``retry_after`` is set when rate limited.
+
+    The message never contains the request URL, which holds the bot token.
+    """
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TelegramTransport:
+    def __init__(self, token: str):
+        self.url = API_URL.format(token=token)
+        self.session = requests.Session()
+
+    def send(self, chat_id, text: str) -> None:
+        try:
+            response = self.session.post(
+                self.url,
+                json={"chat_id": chat_id, "text": text},
+                timeout=TIMEOUT,
+            )
+        except requests.RequestException as error:
+            # The original error and its cause carry the URL.
+            raise TelegramError(
+                f"Telegram request failed: {type(error).__name__}"
+            ) from None
+        if response.ok:
+            return
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        retry_after = None
+        if response.status_code == 429:
+            retry_after = body.get("parameters", {}).get("retry_after")
+        raise TelegramError(
+            f"Telegram responded {response.status_code}: "
+            f"{body.get('description', response.reason)}",
+            retry_after=retry_after,
+        )
+
+
+class FakeTransport:
+    """Records messages instead of sending them, for tests"""
+
+    def __init__(self, token: str = None):
+        self.sent = []
+        self.fail_next = 0
+
+    def send(self, chat_id, text: str) -> None:
+        if self.fail_next:
+            self.fail_next -= 1
+            raise TelegramError("Injected failure")
+        self.sent.append((chat_id, text))
+
+
+class TelegramNotifier:
+    def __init__(
+        self,
+        transport,
+        chat_id,
+        window: float = COALESCE_WINDOW,
+        messages_per_minute: int = MESSAGES_PER_MINUTE,
+        burst: int = BURST,
+    ):
+        self.transport = transport
+        self.chat_id = chat_id
+        self.window = window
+        self.messages_per_minute = messages_per_minute
+        self.burst = burst
+        self._buckets = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def enqueue(self, text: str, chat_id=None) -> None:
+        """Queue a message and return immediately"""
+        self._queue.put((chat_id or self.chat_id, text))
+        self._ensure_worker()
+
+    def send(self, text: str, chat_id=None) -> None:
+        """Send a message now, rate limited, raising on failure"""
+        chat_id = chat_id or self.chat_id
+        bucket = self._bucket(chat_id)
+        time.sleep(bucket.reserve())
+        try:
+            self.transport.send(chat_id, text)
+        except TelegramError as error:
+            if error.retry_after is not None:
+                bucket.hold(error.retry_after)
+            raise
+
+    def flush(self) -> None:
+        """Block until every queued message was handled"""
+        self._queue.join()
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        with self._lock:
+            if chat_id not in self._buckets:
+                self._buckets[chat_id] = TokenBucket(
+                    self.messages_per_minute / 60, self.burst
+                )
+            return self._buckets[chat_id]
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="telegram-notifier", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while (timeout := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                for chat_id, text in coalesce(batch):
+                    self._deliver(chat_id, text)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, chat_id, text: str) -> None:
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            try:
+                self.send(text, chat_id)
+                return
+            except Exception as error:
+                if attempt == SEND_ATTEMPTS:
+                    logger.exception("Dropping Telegram message to %s", chat_id)
+                    return
+                # A rate limited chat already waits in its bucket.
+                if getattr(error, "retry_after", None) is None:
+                    time.sleep(2 ** attempt)
+
+
+def coalesce(messages) -> list:
+    """Merge ``(chat_id, text)`` pairs per chat, within the size limit"""
+    merged = []
+    current = {}
+    for chat_id, text in messages:
+        previous = current.get(chat_id)
+        if previous is not None and (
+            len(merged[previous][1]) + len(text) + 2 <= MAX_MESSAGE_LENGTH
+        ):
+            merged[previous] = (chat_id, f"{merged[previous][1]}\n\n{text}")
+            continue
+        current[chat_id] = len(merged)
+        merged.append((chat_id, text))
+    return merged
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier() -> TelegramNotifier:
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            transport_class = import_string(settings.TELEGRAM_TRANSPORT)
+            _notifier = TelegramNotifier(
+                transport_class(settings.TELEGRAM_BOT_TOKEN),
+                settings.TELEGRAM_CHAT_ID,
+            )
+        return _notifier
+
+
+def reset_notifier() -> None:
+    """Drop the shared notifier, the next call builds a fresh one"""
+    global _notifier
+    with _notifier_lock:
+        _notifier = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting.startswith("TELEGRAM_"):
+        reset_notifier()
@@ -0,0 +1,163 @@
+"""Transactional outbox for the side effects of borrowings.
+
+``enqueue`` stores an ``OutboxEvent`` in the current transaction and asks
+Celery to drain the outbox once that transaction commits. Events that
+could not be dispatched (broker down, remote API error) stay in the table
+and are picked up by the next ``dispatch_outbox`` run, which Celery beat
+also starts every minute (see migration ``borrowing.0009``).
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from borrowing.models import OutboxEvent
+from borrowing.send_telegram_message import send_telegram_message
+from payment.models import Payment
+from payment.stripe_client import CircuitOpenError, get_stripe_client
+from payment.stripe_session import attach_stripe_session
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 10
+# Claims of a worker that died are taken over after this long.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def has_deferred_sessions() -> bool:
+    return OutboxEvent.objects.filter(
+        kind=OutboxEvent.KindChoices.PAYMENT_SESSION,
+        processed_at__isnull=True,
+        attempts__lt=MAX_ATTEMPTS,
+    ).exists()
+
+
+def enqueue(kind: str, **payload) -> OutboxEvent:
+    event = OutboxEvent.objects.create(kind=kind, payload=payload)
+    transaction.on_commit(_schedule_dispatch)
+    return event
+
+
+def enqueue_many(kind: str, payloads) -> list[OutboxEvent]:
+    events = OutboxEvent.objects.bulk_create(
+        OutboxEvent(kind=kind, payload=payload) for payload in payloads
+    )
+    if events:
+        transaction.on_commit(_schedule_dispatch)
+    return events
+
+
+def _schedule_dispatch() -> None:
+    from borrowing.tasks import dispatch_outbox
+
+    try:
+        dispatch_outbox.delay()
+    except Exception:
+        logger.exception("Could not schedule outbox dispatch")
+
+
+def _open_payment_session(payload: dict) -> None:
+    payment = Payment.objects.select_related("borrowing__book").get(
+        pk=payload["payment_id"]
+    )
+    if payment.status == Payment.StatusChoices.PENDING:
+        attach_stripe_session(payment)
+
+
+def _send_telegram_message(payload: dict) -> None:
+    send_telegram_message(payload["text"])
+
+
+HANDLERS = {
+    OutboxEvent.KindChoices.PAYMENT_SESSION: _open_payment_session,
+    OutboxEvent.KindChoices.TELEGRAM_MESSAGE: _send_telegram_message,
+}
+
+
+def dispatch(batch_size: int = BATCH_SIZE) -> int:
+    """Process one batch of pending events, return how many succeeded.
+
+    The batch is claimed for ``CLAIM_TIMEOUT`` in a short transaction
+    (``SKIP LOCKED``), so concurrent workers never handle the same event
+    twice, and the remote calls run outside of any transaction. Payment
+    sessions wait while the Stripe circuit is open, without using up their
+    attempts.
+    """
+    return _dispatch_batch(batch_size)[1]
+
+
+def drain(batch_size: int = BATCH_SIZE) -> int:
+    """Process every pending event once, return how many succeeded.
+
+    Batches follow each other by id until one comes back short, so failed
+    events neither stop the run nor get retried before the next one.
+    """
+    processed, after = 0, 0
+    while True:
+        claimed, succeeded = _dispatch_batch(batch_size, after)
+        processed += succeeded
+        if len(claimed) < batch_size:
+            return processed
+        after = claimed[-1]
+
+
+def _dispatch_batch(batch_size: int, after: int = 0) -> tuple[list, int]:
+    """Process the batch of events after id ``after``.
+
+    Return the claimed ids and how many of those events succeeded.
+    """
+    events = _claim(batch_size, after)
+    processed = 0
+    # The Stripe client is only built for batches with payment sessions.
+    circuit_open = None
+    for event in events:
+        pending = OutboxEvent.objects.filter(pk=event.pk)
+        if event.kind == OutboxEvent.KindChoices.PAYMENT_SESSION:
+            if circuit_open is None:
+                circuit_open = get_stripe_client().breaker.is_open
+            if circuit_open:
+                pending.update(claimed_until=None)
+                continue
+        try:
+            HANDLERS[event.kind](event.payload)
+        except CircuitOpenError:
+            circuit_open = True
+            pending.update(claimed_until=None)
+            continue
+        except Exception as error:
+            logger.exception("Outbox event %s failed", event.pk)
+            pending.update(
+                attempts=F("attempts") + 1,
+                last_error=repr(error),
+                claimed_until=None,
+            )
+            continue
+        pending.update(
+            attempts=F("attempts") + 1,
+            processed_at=timezone.now(),
+            claimed_until=None,
+        )
+        processed += 1
+    return [event.pk for event in events], processed
+
+
+def _claim(batch_size: int, after: int) -> list[OutboxEvent]:
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+                id__gt=after,
+                processed_at__isnull=True,
+                attempts__lt=MAX_ATTEMPTS,
+            )
+            .order_by("id")[:batch_size]
+        )
+        OutboxEvent.objects.filter(
+            pk__in=[event.pk for event in events]
+        ).update(claimed_until=now + CLAIM_TIMEOUT)
+    return events
@@ -0,0 +1,93 @@
+"""Incremental overdue notifications.
+
+Open borrowings nobody was notified about form a due queue, served by the
+``borrowing_overdue_queue_idx`` partial index. Every tick pops the rows
+whose ``expected_return`` has passed, sends them as a few digest messages
+and stamps ``overdue_notified_at``, so the cost of a tick depends on the
+number of newly overdue borrowings, not on the number of open ones.
+Changing ``expected_return`` puts a borrowing back in the queue.
+
+Rows are popped with ``SKIP LOCKED`` and stamped in a short transaction,
+so overlapping ticks never notify the same borrowing twice. The digests
+are sent once it commits, rate limited by the notifier: a failed send
+puts its rows back in the queue for the next tick.
+"""
+from datetime import date
+from itertools import groupby
+
+from django.db import transaction
+from django.utils import timezone
+
+from borrowing.models import Borrowing
+from borrowing.send_telegram_message import send_telegram_message
+
+DIGEST_SIZE = 50
+# Telegram rejects messages longer than 4096 characters.
+MAX_MESSAGE_LENGTH = 4000
+
+
+def due_borrowings(day: date):
+    return Borrowing.objects.filter(
+        expected_return__lte=day,
+        actual_return__isnull=True,
+        overdue_notified_at__isnull=True,
+    )
+
+
+def format_digest(borrowings: list) -> list[str]:
+    """Digest lines grouped per user, split into messages Telegram accepts"""
+    lines = []
+    ordered = sorted(borrowings, key=lambda borrowing: borrowing.user.email)
+    for email, user_borrowings in groupby(
+        ordered, key=lambda borrowing: borrowing.user.email
+    ):
+        lines.append(f"Overdue borrowings of {email}:")
+        lines.extend(
+            f"- book: {borrowing.book.title}, "
+            f"must be returned: {borrowing.expected_return}."
+            for borrowing in user_borrowings
+        )
+
+    messages, current = [], ""
+    for line in lines:
+        if current and len(current) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+            messages.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        messages.append(current)
+    return messages
+
+
+def notify_overdue_borrowings(day: date = None, send=None) -> int:
+    """Notify about borrowings that became overdue, return how many"""
+    day = day or date.today()
+    send = send or send_telegram_message
+    notified = 0
+
+    while True:
+        stamp = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                due_borrowings(day)
+                .select_related("book", "user")
+                .select_for_update(skip_locked=True, of=("self",))
+                .only("id", "expected_return", "book__title", "user__email")
+                .order_by("expected_return", "id")[:DIGEST_SIZE]
+            )
+            if not batch:
+                return notified
+            popped = Borrowing.objects.filter(
+                pk__in=[borrowing.pk for borrowing in batch]
+            )
+            popped.update(overdue_notified_at=stamp)
+
+        try:
+            for message in format_digest(batch):
+                send(message)
+        except Exception:
+            popped.filter(overdue_notified_at=stamp).update(
+                overdue_notified_at=None
+            )
+            raise
+        notified += len(batch)
@@ -1,12 +1,18 @@
+from django.db import transaction
+from django.db.models import Prefetch
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from book.inventory import reserve_copy
 from book.serializers import BookSerializer
-from payment.serializers import PaymentListSerializer
+from library_api.dynamic_fields import DynamicFieldsMixin
+from library_api.fast_serializers import ValuesSerializer, as_str, is_none
+from payment.serializers import PaymentListSerializer, PaymentSerializer
 from borrowing.models import Borrowing
 from payment.models import Payment
 
 
-class BorrowingListSerializer(serializers.ModelSerializer):
+class BorrowingListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     book = serializers.CharField(source="book.title", read_only=True)
     user = serializers.CharField(source="user.username", read_only=True)
 
@@ -18,15 +24,36 @@ class BorrowingListSerializer(serializers.ModelSerializer):
             "user",
             "is_active",
         )
+        field_lookups = {
+            "book": ("book__title",),
+            "user": ("user__email",),
+            "is_active": ("actual_return",),
+        }
+        expandable_fields = {
+            "book": ("book.serializers.BookSerializer", {"read_only": True}),
+        }
+
+
+class BorrowingListValuesSerializer(ValuesSerializer):
+    fields = (
+        ("id", "id", None),
+        ("book", "book__title", as_str),
+        # User has no username column, so the field always renders null.
+        ("user", None, None),
+        ("is_active", "actual_return", is_none),
+    )
 
 
-class BorrowingDetailSerializer(serializers.ModelSerializer):
+class BorrowingDetailSerializer(
+    DynamicFieldsMixin,
+    serializers.ModelSerializer,
+):
     book = BookSerializer(many=False, read_only=True)
     user = serializers.CharField(source="user.username", read_only=True)
     payment_info = PaymentListSerializer(
         many=True,
         read_only=True,
-        source="payment",
+        source="payments",
     )
 
     class Meta:
@@ -41,9 +68,18 @@ class BorrowingDetailSerializer(serializers.ModelSerializer):
             "user",
             "payment_info",
         )
+        nested_fields = {"book": "book.serializers.BookSerializer"}
+        field_lookups = {"user": ("user__email",)}
+        prefetch_fields = {
+            "payment_info": Prefetch(
+                "payments", queryset=Payment.objects.order_by("id")
+            ),
+        }
 
 
 class BorrowingCreateSerializer(serializers.ModelSerializer):
+    payment = serializers.SerializerMethodField()
+
     class Meta:
         model = Borrowing
         fields = (
@@ -52,8 +88,19 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
             "expected_return",
             "actual_return",
             "book",
+            "payment",
         )
 
+    @extend_schema_field(PaymentSerializer)
+    def get_payment(self, borrowing):
+        """Pending payment; its session_url is filled in asynchronously"""
+        payment = borrowing.payments.filter(
+            status=Payment.StatusChoices.PENDING
+        ).order_by("id").first()
+        if payment is None:
+            return None
+        return PaymentSerializer(payment).data
+
     def validate(self, data):
         book = data.get("book")
         user = self.context["request"].user
@@ -66,20 +113,23 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
                 "This borrowing is forbidden. "
                 "You have to complete your pending payment"
             )
-        if book.inventory == 0:
+        if book.inventory == 0 and not book.inventory_stripes:
             raise serializers.ValidationError("There isn't available book")
 
         return data
 
     def create(self, validated_data):
         book = validated_data.get("book")
-        book.inventory -= 1
-        book.save()
 
-        borrowing = Borrowing.objects.create(
-            user=self.context["request"].user,
-            **validated_data,
-        )
+        with transaction.atomic():
+            if not reserve_copy(book):
+                raise serializers.ValidationError(
+                    "There isn't available book"
+                )
+            borrowing = Borrowing.objects.create(
+                user=self.context["request"].user,
+                **validated_data,
+            )
 
         return borrowing
 
@@ -1,21 +1,23 @@
-from datetime import date
 from celery import shared_task
 
-from borrowing.models import Borrowing
-from borrowing.send_telegram_message import send_telegram_message
+from borrowing import outbox
+from borrowing.notifier import get_notifier
+from borrowing.overdue import notify_overdue_borrowings
+from payment.stripe_client import get_stripe_client
 
 
 @shared_task
 def check_overdue_borrowings():
-    today = date.today()
-    overdue_borrowings = Borrowing.objects.filter(
-        expected_return__lte=today,
-        actual_return__isnull=True,
-    )
-    if overdue_borrowings:
-        for borrowing in overdue_borrowings:
-            message = (f"Overdue borrowing - book: {borrowing.book.title},"
-                       f"must be returned: {borrowing.expected_return}.")
-            send_telegram_message(message)
-        else:
-            send_telegram_message("No overdue borrowing today.")
+    notify_overdue_borrowings()
+    get_notifier().flush()
+
+
+@shared_task(bind=True, max_retries=None)
+def dispatch_outbox(self):
+    outbox.drain()
+    get_notifier().flush()
+
+    if outbox.has_deferred_sessions():
+        breaker = get_stripe_client().breaker
+        if breaker.is_open:
+            raise self.retry(countdown=breaker.retry_after)
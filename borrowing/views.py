@@ -1,23 +1,65 @@
-from datetime import datetime
+from datetime import date
 
+from asgiref.sync import sync_to_async
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets, status, permissions
+from django.db import transaction
+from django.db.models.functions import Now
+from django.shortcuts import aget_object_or_404
+from rest_framework import mixins, status, permissions
 from rest_framework.decorators import action
-from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from book.inventory import release_copy
 from borrowing.models import Borrowing
 from borrowing.serializers import (
     BorrowingListSerializer,
     BorrowingDetailSerializer, BorrowingCreateSerializer,
+    BorrowingListValuesSerializer,
 )
+from library_api.async_views import GenericViewSet
+from library_api.conditional import ConditionalGetMixin
+from library_api.dynamic_fields import DynamicFieldsViewMixin
+from library_api.export import ExportMixin
+from library_api.fast_serializers import FastListMixin
 
 
-class BorrowingViewSet(viewsets.ModelViewSet):
+class BorrowingViewSet(
+    ConditionalGetMixin,
+    FastListMixin,
+    DynamicFieldsViewMixin,
+    ExportMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.UpdateModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    """Borrowings of the current user, or of everyone for staff.
+
+    ``create`` and ``return`` are coroutines: the database work runs in the
+    request's executor thread and the event loop stays free meanwhile. The
+    other actions are plain DRF and run in a thread under ASGI.
+    """
+
     queryset = Borrowing.objects.select_related("user", "book")
+    fast_list_serializer = BorrowingListValuesSerializer
+    pagination_ordering = ("-borrow_date", "-id")
+    export_fields = (
+        "id",
+        "borrow_date",
+        "expected_return",
+        "actual_return",
+        "book_id",
+        "user_id",
+        "updated_at",
+    )
+    export_filename = "borrowings"
 
     permission_classes = [permissions.IsAuthenticated]
+    # Queries per action, including the JWT user lookup on a cache miss.
+    query_budgets = {"list": 3, "retrieve": 4}
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -26,6 +68,11 @@ class BorrowingViewSet(viewsets.ModelViewSet):
             return BorrowingDetailSerializer
         return BorrowingListSerializer
 
+    def get_conditional_fields(self):
+        if self.action == "retrieve":
+            return "updated_at", "book__updated_at", "payments__updated_at"
+        return "updated_at", "book__updated_at"
+
     @staticmethod
     def _params_to_inst(qs):
         """Converts a list of string IDs to a list of integers"""
@@ -37,7 +84,6 @@ class BorrowingViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         if user.is_staff:
-            queryset = Borrowing.objects.all()
             user_id_param = self.request.query_params.get("user")
 
             if user_id_param:
@@ -49,7 +95,7 @@ class BorrowingViewSet(viewsets.ModelViewSet):
         if is_active:
             queryset = queryset.filter(actual_return__isnull=True)
 
-        return queryset.distinct()
+        return self.optimize_queryset(queryset)
 
     @extend_schema(
         parameters=[
@@ -70,21 +116,46 @@ class BorrowingViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    async def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        data = await sync_to_async(self._create)(serializer)
+        return Response(
+            data,
+            status=status.HTTP_201_CREATED,
+            headers=self.get_success_headers(data),
+        )
+
+    @staticmethod
+    def _create(serializer) -> dict:
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return serializer.data
+
     @extend_schema(request=None)
     @action(detail=True, methods=["POST"], url_path="return")
-    def return_borrowing(self, request, pk=None):
-        borrowing = get_object_or_404(Borrowing, pk=pk)
-        if borrowing.actual_return is not None:
+    async def return_borrowing(self, request, pk=None):
+        borrowing = await aget_object_or_404(
+            Borrowing.objects.select_related("book"), pk=pk
+        )
+        returned = await sync_to_async(self._return)(borrowing)
+
+        if not returned:
             return Response(
                 {"detail": "Your borrowing is already returned"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        borrowing.actual_return = datetime.now()
-        borrowing.book.inventory += 1
-        borrowing.book.save()
-        borrowing.save()
 
         return Response(
             {"detail": "Borrowing has returned"},
             status=status.HTTP_200_OK,
         )
+
+    @staticmethod
+    def _return(borrowing: Borrowing) -> bool:
+        with transaction.atomic():
+            returned = Borrowing.objects.filter(
+                pk=borrowing.pk, actual_return__isnull=True
+            ).update(actual_return=date.today(), updated_at=Now())
+            if returned:
+                release_copy(borrowing.book)
+        return bool(returned)
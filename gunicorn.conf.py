@@ -0,0 +1,23 @@
+"""Production server: gunicorn managing uvicorn workers on the ASGI app.
+
+    gunicorn -c gunicorn.conf.py library_api.asgi:application
+
+``WEB_CONCURRENCY`` overrides the worker count picked by
+``library_api.serving.autotune_workers``.
+"""
+import os
+
+from library_api.serving import autotune_workers
+
+bind = os.getenv("BIND", "0.0.0.0:8080")
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", 0)) or autotune_workers()
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then, staggered so they do not restart together.
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = "-"
@@ -2,6 +2,7 @@
 ASGI config for library_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served in production by gunicorn with uvicorn workers, see gunicorn.conf.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -9,8 +10,14 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_api.settings")
 
 application = get_asgi_application()
+
+if settings.DEBUG:
+    # runserver used to serve the admin and browsable API assets.
+    application = ASGIStaticFilesHandler(application)
@@ -0,0 +1,32 @@
+"""Base classes for views with coroutine handlers, on top of adrf.
+
+adrf checks throttles through ``async_to_sync`` even when none of them is a
+coroutine, so every request started a nested event loop from its sync
+thread. Besides the extra thread per request, while that loop runs the
+``sync_to_async`` calls of concurrent requests may be handed to its
+short-lived executor and never run. The throttles of this project are
+synchronous, so they are checked in the calling thread like in DRF.
+"""
+import asyncio
+
+from adrf import viewsets
+from adrf.views import APIView as AdrfAPIView
+from rest_framework.views import APIView as DRFAPIView
+
+
+class SyncThrottlesMixin:
+    def check_throttles(self, request):
+        if any(
+            asyncio.iscoroutinefunction(throttle.allow_request)
+            for throttle in self.get_throttles()
+        ):
+            return super().check_throttles(request)
+        return DRFAPIView.check_throttles(self, request)
+
+
+class APIView(SyncThrottlesMixin, AdrfAPIView):
+    pass
+
+
+class GenericViewSet(SyncThrottlesMixin, viewsets.GenericViewSet):
+    pass
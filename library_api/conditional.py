@@ -0,0 +1,108 @@
+import hashlib
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified support for ``list`` and ``retrieve``.
+
+    Validators are computed from ``conditional_fields``: the ``updated_at``
+    columns of the object and of related objects shown in the response.
+    Only those columns are fetched, so a matching ``If-None-Match`` or
+    ``If-Modified-Since`` is answered with 304 before any serialization.
+
+    Lists only get an ETag: it covers the primary keys of the page, while
+    the newest ``updated_at`` stays the same when a row is deleted or stops
+    matching the filters. ``Last-Modified`` is only sent once the second it
+    names is over.
+    """
+
+    conditional_fields = ("updated_at",)
+
+    def get_conditional_fields(self):
+        return self.conditional_fields
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.prefetch_related(None)
+        fields = ("pk", *self.get_conditional_fields())
+        page_state = ()
+
+        if self.paginator is not None:
+            ordering = self.paginator.get_ordering(request, queryset, self)
+            values = queryset.values(
+                *fields, *(name.lstrip("-") for name in ordering)
+            )
+            rows = self.paginate_queryset(values) or []
+            page_state = (
+                getattr(self.paginator, "has_next", None),
+                getattr(self.paginator, "has_previous", None),
+            )
+        else:
+            rows = list(queryset.values(*fields))
+
+        etag = self._get_etag(
+            request, [[row[name] for name in fields] for row in rows], page_state
+        )
+        return self._conditional_response(
+            (etag, None), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        queryset = queryset.prefetch_related(None)
+        rows = list(
+            queryset.order_by().values_list(*self.get_conditional_fields())
+        )
+        if not rows:
+            return super().retrieve(request, *args, **kwargs)
+
+        rows = sorted(rows, key=repr)
+        validators = (self._get_etag(request, rows), self._last_modified(rows))
+        return self._conditional_response(
+            validators, super().retrieve, request, *args, **kwargs
+        )
+
+    @staticmethod
+    def _get_etag(request, rows, extra=()):
+        digest = hashlib.sha1(request.get_full_path().encode())
+        digest.update(repr((rows, extra)).encode())
+        return quote_etag(digest.hexdigest())
+
+    @staticmethod
+    def _last_modified(rows):
+        modified = [
+            value
+            for row in rows
+            for value in row
+            if hasattr(value, "timestamp")
+        ]
+        if not modified:
+            return None
+        # HTTP dates have no sub-second part: until the second is over,
+        # a later update would get the same Last-Modified.
+        last_modified = int(max(modified).timestamp())
+        if last_modified + 1 > timezone.now().timestamp():
+            return None
+        return last_modified
+
+    @staticmethod
+    def _conditional_response(validators, handler, request, *args, **kwargs):
+        etag, last_modified = validators
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
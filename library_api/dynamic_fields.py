@@ -0,0 +1,160 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+
+def parse_field_list(value):
+    """Convert a string of format 'a,b,c' to a set {'a', 'b', 'c'}"""
+    if not value:
+        return set()
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class QueryPlan:
+    """Columns, joins and prefetches needed to serialize a set of fields"""
+
+    def __init__(self):
+        self.only = set()
+        self.select_related = set()
+        self.prefetch_related = []
+
+    def add_lookup(self, lookup: str) -> None:
+        self.only.add(lookup)
+        parts = lookup.split("__")
+        for depth in range(1, len(parts)):
+            relation = "__".join(parts[:depth])
+            self.select_related.add(relation)
+            # A relation followed with select_related must not be deferred.
+            self.only.add(relation)
+
+    def apply(self, queryset, extra_fields=()):
+        queryset = queryset.select_related(None)
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset.only("pk", *sorted(self.only), *extra_fields)
+
+
+class DynamicFieldsMixin:
+    """Serializer mixin for ``?fields=`` (sparse fieldsets) and ``?expand=``.
+
+    Meta options:
+
+    * ``field_lookups`` - ORM lookups read by a field, for fields that
+      are not plain model columns (ex. ``{"book": ("book__title",)}``);
+    * ``nested_fields`` - ``{name: serializer path}`` for fields rendered
+      by a nested serializer, whose own query plan is merged in;
+    * ``prefetch_fields`` - prefetch lookups (or ``Prefetch`` objects)
+      needed by a field;
+    * ``expandable_fields`` - ``{name: (serializer path, kwargs)}``, fields
+      replaced with a nested serializer when listed in ``?expand=``.
+
+    Only the top level serializer of a response reacts to query params.
+    """
+
+    @property
+    def _is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def _requested(self):
+        request = self.context.get("request")
+        if request is None or not self._is_root:
+            return set(), set()
+        return (
+            parse_field_list(request.query_params.get("fields")),
+            parse_field_list(request.query_params.get("expand")),
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self._requested()
+
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        for name in expand & set(expandable) & set(fields):
+            serializer_path, kwargs = expandable[name]
+            fields[name] = import_string(serializer_path)(**kwargs)
+
+        if requested & set(fields):
+            fields = {
+                name: field
+                for name, field in fields.items()
+                if name in requested
+            }
+        return fields
+
+    @classmethod
+    def get_query_plan(cls, request=None, plan=None, prefix=""):
+        """Collect the query plan for the fields a request will render"""
+        plan = plan or QueryPlan()
+        meta = cls.Meta
+        requested, expand = set(), set()
+        if request is not None:
+            requested = parse_field_list(request.query_params.get("fields"))
+            expand = parse_field_list(request.query_params.get("expand"))
+
+        names = list(meta.fields)
+        if requested & set(names):
+            names = [name for name in names if name in requested]
+
+        expandable = getattr(meta, "expandable_fields", {})
+        nested_fields = getattr(meta, "nested_fields", {})
+        lookups = getattr(meta, "field_lookups", {})
+        prefetches = getattr(meta, "prefetch_fields", {})
+
+        for name in names:
+            nested_path = nested_fields.get(name)
+            if name in expand and name in expandable:
+                nested_path = expandable[name][0]
+            if nested_path:
+                import_string(nested_path).get_query_plan(
+                    plan=plan, prefix=f"{prefix}{name}__"
+                )
+                continue
+            if name in prefetches:
+                if not prefix:
+                    plan.prefetch_related.append(prefetches[name])
+                continue
+            for lookup in lookups.get(name, cls._default_lookups(name)):
+                plan.add_lookup(prefix + lookup)
+        return plan
+
+    @classmethod
+    def _default_lookups(cls, name):
+        try:
+            field = cls.Meta.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return ()
+        if field.concrete:
+            return (field.name,)
+        return ()
+
+
+class DynamicFieldsViewMixin:
+    """Narrows ``list`` / ``retrieve`` querysets to the requested fields"""
+
+    def optimize_queryset(self, queryset):
+        if self.action not in ("list", "retrieve"):
+            return queryset
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, "get_query_plan"):
+            return queryset
+
+        plan = serializer_class.get_query_plan(self.request)
+        ordering = ()
+        if self.action == "list" and self.paginator is not None:
+            ordering = [
+                name.lstrip("-")
+                for name in self.paginator.get_ordering(
+                    self.request, queryset, self
+                )
+                if name.lstrip("-") in self._concrete_field_names(queryset)
+            ]
+        return plan.apply(queryset, extra_fields=ordering)
+
+    @staticmethod
+    def _concrete_field_names(queryset):
+        return {field.name for field in queryset.model._meta.concrete_fields}
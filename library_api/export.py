@@ -0,0 +1,51 @@
+from django.core.handlers.asgi import ASGIRequest
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+
+from library_api.streaming import CSV, NDJSON, export_response
+
+
+class ExportMixin:
+    """Adds an admin-only ``export/`` action streaming ``export_fields``"""
+
+    export_fields = ()
+    export_filename = "export"
+
+    @extend_schema(
+        summary="Export as NDJSON or CSV",
+        description="Admin can stream every row matching the list filters",
+        parameters=[
+            OpenApiParameter(
+                name="output",
+                type=OpenApiTypes.STR,
+                enum=[NDJSON, CSV],
+                description="Output format, ndjson by default "
+                            "(ex. ?output=csv)",
+            ),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+    )
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
+        data_format = request.query_params.get("output", NDJSON)
+        if data_format not in (NDJSON, CSV):
+            raise ValidationError(
+                {"output": f"Choose one of: {NDJSON}, {CSV}"}
+            )
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by("pk")
+        return export_response(
+            queryset,
+            self.export_fields,
+            data_format,
+            self.export_filename,
+            asynchronous=isinstance(request._request, ASGIRequest),
+        )
@@ -0,0 +1,102 @@
+from rest_framework.response import Response
+
+from library_api.dynamic_fields import parse_field_list
+
+
+def as_str(value):
+    return None if value is None else str(value)
+
+
+def is_none(value):
+    return value is None
+
+
+class ValuesSerializer:
+    """Read-only serializer working on ``.values()`` rows.
+
+    ``fields`` is a tuple of ``(name, lookup, converter)``: ``lookup`` is the
+    ``.values()`` key read for the field (None renders null) and
+    ``converter`` turns it into the same primitive the DRF serializer
+    would produce (None passes the value through). A row-to-dict function
+    is generated once per field selection, so serializing a row is a
+    single call with no per-field dispatch.
+    """
+
+    fields = ()
+    _compiled = None
+
+    def __init__(self, request=None):
+        names = parse_field_list(
+            request.query_params.get("fields") if request else None
+        )
+        self.fields = tuple(
+            field for field in self.fields if not names or field[0] in names
+        ) or type(self).fields
+
+    @property
+    def lookups(self):
+        return tuple(
+            dict.fromkeys(lookup for _, lookup, _ in self.fields if lookup)
+        )
+
+    def serialize(self, rows):
+        to_dict = self._get_compiled(self.fields)
+        return [to_dict(row) for row in rows]
+
+    @classmethod
+    def _get_compiled(cls, fields):
+        if cls.__dict__.get("_compiled") is None:
+            cls._compiled = {}
+        if fields not in cls._compiled:
+            cls._compiled[fields] = cls._compile(fields)
+        return cls._compiled[fields]
+
+    @staticmethod
+    def _compile(fields):
+        namespace = {}
+        items = []
+        for index, (name, lookup, converter) in enumerate(fields):
+            value = "None" if lookup is None else f"row[{lookup!r}]"
+            if converter is not None:
+                namespace[f"convert_{index}"] = converter
+                value = f"convert_{index}({value})"
+            items.append(f"{name!r}: {value}")
+
+        source = f"def to_dict(row):\n    return {{{', '.join(items)}}}\n"
+        exec(source, namespace)
+        return namespace["to_dict"]
+
+
+class FastListMixin:
+    """Serve ``list`` through ``fast_list_serializer`` when possible.
+
+    Falls back to the regular serializer for ``?expand=`` requests.
+    """
+
+    fast_list_serializer = None
+
+    def get_fast_list_serializer(self):
+        if self.fast_list_serializer is None:
+            return None
+        if self.request.query_params.get("expand"):
+            return None
+        return self.fast_list_serializer(self.request)
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_fast_list_serializer()
+        if serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.prefetch_related(None)
+        lookups = serializer.lookups
+        if self.paginator is not None:
+            ordering = self.paginator.get_ordering(request, queryset, self)
+            lookups += tuple(
+                name.lstrip("-")
+                for name in ordering
+                if name.lstrip("-") not in lookups
+            )
+            page = self.paginate_queryset(queryset.values(*lookups))
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset.values(*lookups)))
@@ -0,0 +1,166 @@
+import datetime
+import json
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+KeysetCursor = namedtuple("KeysetCursor", ["position", "reverse"])
+
+
+class KeysetPagination(CursorPagination):
+    """Keyset pagination over a multi-column ordering.
+
+    Views may set ``pagination_ordering`` (or define
+    ``get_pagination_ordering()``) to page by something other than the
+    primary key. The cursor holds the ordering values of the row a page
+    starts after, and the page is read with the row comparison
+    ``(a, b) > (x, y)`` spelled out per column, so columns may be sorted in
+    different directions and no OFFSET is issued however many rows tie on
+    the first column. Ordering columns must not be null and the last one
+    must be unique.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-id",)
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, "get_pagination_ordering"):
+            ordering = view.get_pagination_ordering()
+        else:
+            ordering = getattr(view, "pagination_ordering", self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self._check_unique(queryset.model, self.ordering[-1])
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        # Previous pages are read backwards from the first row shown.
+        ordering = _reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(_after(ordering, self.cursor.position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = (
+            self._position(self.page[-1]) if self.page
+            else self.cursor.position
+        )
+        return self.encode_cursor(KeysetCursor(position, False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = (
+            self._position(self.page[0]) if self.page
+            else self.cursor.position
+        )
+        return self.encode_cursor(KeysetCursor(position, True))
+
+    def encode_cursor(self, cursor):
+        data = {"p": cursor.position}
+        if cursor.reverse:
+            data["r"] = 1
+        encoded = b64encode(json.dumps(data, default=_to_json).encode())
+        encoded = encoded.decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(b64decode(encoded.encode(), validate=True))
+            position = data["p"]
+            reverse = bool(data.get("r"))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+            len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return KeysetCursor(position, reverse)
+
+    def _position(self, row) -> list:
+        names = [name.lstrip("-") for name in self.ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    @staticmethod
+    def _check_unique(model, name: str) -> None:
+        name = name.lstrip("-")
+        if name == "pk":
+            return
+        try:
+            unique = model._meta.get_field(name).unique
+        except FieldDoesNotExist:
+            unique = False
+        if not unique:
+            raise ImproperlyConfigured(
+                f"Pagination ordering of {model.__name__} must end with a "
+                f"unique field, not {name!r}"
+            )
+
+
+def _to_json(value):
+    # Unlike DjangoJSONEncoder, keeps microseconds: positions must be exact.
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot put {type(value).__name__} in a cursor")
+
+
+def _reversed(ordering) -> tuple:
+    return tuple(
+        name[1:] if name.startswith("-") else f"-{name}" for name in ordering
+    )
+
+
+def _after(ordering, position) -> Q:
+    """Rows sorted after ``position``: ``(a, b) > (x, y)`` per direction"""
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, position):
+        field = name.lstrip("-")
+        lookup = "lt" if name.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{field}__{lookup}": value})
+        equal &= Q(**{field: value})
+
+    # The redundant bound on the first column lets it drive an index scan.
+    first = ordering[0]
+    bound = "lte" if first.startswith("-") else "gte"
+    return Q(**{f"{first.lstrip('-')}__{bound}": position[0]}) & condition
@@ -0,0 +1,123 @@
+"""Per-request query instrumentation.
+
+``QueryRecorder`` collects every SQL statement run on the default database
+while it is active. Statements are grouped by shape (the SQL with its
+placeholders, before parameters are bound), so a shape executed once per
+row of a page, the usual N+1 symptom, shows up as a repeated shape.
+
+``QueryCountMiddleware`` records each request, reports the count in the
+``X-Query-Count`` header and logs a warning when a view exceeds the budget
+it declares in ``query_budgets`` (``{action or method: max queries}``) or
+repeats a query shape.
+"""
+import logging
+from collections import Counter
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+REPEATED_SHAPE_THRESHOLD = 3
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.shapes = Counter()
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.shapes[sql] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self) -> int:
+        return sum(self.shapes.values())
+
+    def repeated(self, threshold: int = REPEATED_SHAPE_THRESHOLD) -> dict:
+        """Query shapes executed at least ``threshold`` times"""
+        return {
+            sql: count
+            for sql, count in self.shapes.items()
+            if count >= threshold
+        }
+
+
+def get_query_budget(view_func, method: str):
+    """Budget declared by the view handling a request, if any"""
+    view_class = getattr(view_func, "cls", None) or getattr(
+        view_func, "view_class", None
+    )
+    budgets = getattr(view_class, "query_budgets", None)
+    if not budgets:
+        return None
+    action = (getattr(view_func, "actions", None) or {}).get(method.lower())
+    return budgets.get(action, budgets.get(method.upper()))
+
+
+class QueryCountMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request.query_budget = None
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        self.report(request, response, recorder)
+        return response
+
+    async def __acall__(self, request):
+        # The ORM calls of an async request run in the request's thread
+        # sensitive executor thread, so its connection is instrumented.
+        request.query_budget = None
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        self.report(request, response, recorder)
+        return response
+
+    @staticmethod
+    def report(request, response, recorder: QueryRecorder) -> None:
+        response["X-Query-Count"] = str(recorder.count)
+        budget = request.query_budget
+        if budget is not None and recorder.count > budget:
+            logger.warning(
+                "%s %s ran %d queries, budget is %d",
+                request.method,
+                request.path,
+                recorder.count,
+                budget,
+            )
+        for sql, count in recorder.repeated().items():
+            logger.warning(
+                "%s %s repeated a query %d times: %s",
+                request.method,
+                request.path,
+                count,
+                sql,
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func, request.method)
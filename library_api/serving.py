@@ -0,0 +1,60 @@
+"""Worker count for the ASGI server.
+
+Each uvicorn worker is one process with one event loop, which keeps a
+core busy on its own, so the default is a worker per CPU the container
+may use: the cgroup CPU quota when there is one, the CPU affinity
+otherwise. The count is then capped so that ``WORKER_MEMORY`` per worker
+fits in the cgroup memory limit.
+"""
+import math
+import os
+from pathlib import Path
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+WORKERS_PER_CPU = 1
+# Resident size of a worker under load, in bytes.
+WORKER_MEMORY = int(os.getenv("WEB_WORKER_MEMORY_MB", 256)) * 2 ** 20
+
+
+def _read(path: Path):
+    try:
+        return path.read_text().split()
+    except OSError:
+        return None
+
+
+def cpu_limit(cgroup_root: Path = CGROUP_ROOT) -> float:
+    """CPUs available to the process, fractional under a CPU quota"""
+    cpus = float(len(os.sched_getaffinity(0)))
+
+    quota = _read(cgroup_root / "cpu.max")
+    if quota and quota[0] != "max":
+        return min(cpus, int(quota[0]) / int(quota[1]))
+
+    quota = _read(cgroup_root / "cpu" / "cpu.cfs_quota_us")
+    period = _read(cgroup_root / "cpu" / "cpu.cfs_period_us")
+    if quota and period and int(quota[0]) > 0:
+        return min(cpus, int(quota[0]) / int(period[0]))
+    return cpus
+
+
+def memory_limit(cgroup_root: Path = CGROUP_ROOT):
+    """Memory limit of the cgroup in bytes, None when unlimited"""
+    limit = _read(cgroup_root / "memory.max")
+    if limit is None:
+        limit = _read(cgroup_root / "memory" / "memory.limit_in_bytes")
+    if not limit or limit[0] == "max":
+        return None
+    # cgroup v1 reports "no limit" as a number close to 2 ** 63.
+    value = int(limit[0])
+    return value if value < 2 ** 60 else None
+
+
+def autotune_workers(cpus: float = None, memory: int = None) -> int:
+    cpus = cpu_limit() if cpus is None else cpus
+    memory = memory_limit() if memory is None else memory
+
+    workers = max(1, math.ceil(cpus * WORKERS_PER_CPU))
+    if memory:
+        workers = min(workers, max(1, memory // WORKER_MEMORY))
+    return workers
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "drf_spectacular",
     "book",
@@ -58,6 +59,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "library_api.query_count.QueryCountMiddleware",
 ]
 
 ROOT_URLCONF = "library_api.urls"
@@ -148,8 +150,21 @@ AUTH_USER_MODEL = "user.User"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+        "user.authentication.CachedJWTAuthentication",
+    ),
+    "DEFAULT_PAGINATION_CLASS": "library_api.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
+    "DEFAULT_THROTTLE_CLASSES": (
+        "library_api.throttling.UserTokenBucketThrottle",
+        "library_api.throttling.ScopedTokenBucketThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": os.getenv("THROTTLE_RATE_ANON", "300/min"),
+        "user": os.getenv("THROTTLE_RATE_USER", "1200/min"),
+        # Password hashing makes these the most expensive requests.
+        "token": os.getenv("THROTTLE_RATE_TOKEN", "20/min"),
+        "register": os.getenv("THROTTLE_RATE_REGISTER", "10/min"),
+    },
 }
 
 SPECTACULAR_SETTINGS = {
@@ -169,13 +184,47 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60 * 60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.TokenObtainPairSerializer",
 }
 
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+BOOK_CACHE_TIMEOUT = int(os.getenv("BOOK_CACHE_TIMEOUT", 5 * 60))
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", 5 * 60))
+AUTH_USER_LOCAL_TTL = int(os.getenv("AUTH_USER_LOCAL_TTL", 5))
+
+# Throttling buckets are kept in process memory when unset.
+THROTTLE_REDIS_URL = os.getenv("THROTTLE_REDIS_URL", CACHE_REDIS_URL)
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = "Europe/Kyiv"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+# borrowing.notifier.FakeTransport records messages instead of sending them
+TELEGRAM_TRANSPORT = os.getenv(
+    "TELEGRAM_TRANSPORT", "borrowing.notifier.TelegramTransport"
+)
+
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+# Ex. http://127.0.0.1:12111 to use `manage.py run_fake_stripe`
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
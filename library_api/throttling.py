@@ -0,0 +1,177 @@
+"""Token bucket throttling.
+
+Every ``(scope, user or client IP)`` pair owns a bucket holding up to
+``num_requests`` tokens that refills at ``num_requests / duration`` tokens
+per second, with rates taken from DRF's ``DEFAULT_THROTTLE_RATES``. Unlike
+DRF's sliding window, which stores a timestamp per request, a bucket is two
+numbers and bursts up to the full rate are allowed after idle periods.
+
+With ``THROTTLE_REDIS_URL`` set the buckets live in Redis and each check is
+one ``EVALSHA`` of a Lua script, atomic across processes. Otherwise they
+live in process memory, which is enough for tests and a single process.
+If Redis is unreachable requests are let through.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+if tokens < 1 then
+    return {0, tostring((1 - tokens) / rate)}
+end
+redis.call("HSET", KEYS[1], "tokens", tokens - 1, "updated_at", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return {1, "0"}
+"""
+
+MAX_LOCAL_BUCKETS = 10000
+
+
+class LocalBuckets:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Take a token, return 0 or the seconds until one is available"""
+        with self._lock:
+            now = self.clock()
+            tokens, updated_at = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            if len(self.buckets) >= MAX_LOCAL_BUCKETS:
+                self._prune(now, capacity / rate)
+            self.buckets[key] = (tokens - 1, now)
+            return 0.0
+
+    def _prune(self, now: float, refill_time: float) -> None:
+        # A bucket untouched for a full refill is the same as a new one.
+        self.buckets = {
+            key: state
+            for key, state in self.buckets.items()
+            if now - state[1] < refill_time
+        }
+
+
+class RedisBuckets:
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(TAKE_TOKEN_SCRIPT)
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        allowed, wait = self.script(keys=[key], args=[capacity, rate])
+        return 0.0 if allowed else float(wait)
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def get_buckets():
+    global _buckets
+    with _buckets_lock:
+        if _buckets is None:
+            if settings.THROTTLE_REDIS_URL:
+                _buckets = RedisBuckets(settings.THROTTLE_REDIS_URL)
+            else:
+                _buckets = LocalBuckets()
+        return _buckets
+
+
+def reset_buckets() -> None:
+    """Drop the shared backend, with every in-memory bucket"""
+    global _buckets
+    with _buckets_lock:
+        _buckets = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting in ("THROTTLE_REDIS_URL", "REST_FRAMEWORK"):
+        reset_buckets()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def __init__(self):
+        # The scope, and so the rate, may depend on the request.
+        pass
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_rate(self):
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f"No default throttle rate set for '{self.scope}' scope"
+            )
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        key = self.get_cache_key(request, view)
+        try:
+            self.retry_after = get_buckets().take(
+                key, self.num_requests, self.num_requests / self.duration
+            )
+        except Exception:
+            logger.exception("Throttling backend failed, letting %s in", key)
+            return True
+        return self.retry_after == 0
+
+    def wait(self):
+        return math.ceil(self.retry_after)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Overall budget of a user, or of a client IP for anonymous requests"""
+
+    def get_scope(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return "user"
+        return "anon"
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """Separate budget for views that set a ``throttle_scope``"""
+
+    def get_scope(self, request, view):
+        return getattr(view, "throttle_scope", None)
@@ -0,0 +1,197 @@
+"""Local stand-in for the Stripe Checkout Sessions API.
+
+Implements the calls this project makes (create, retrieve, expire) with
+configurable latency and error injection, so checkout can be load tested
+and exercised offline. Point the ``stripe`` client at it with
+``STRIPE_API_BASE=http://127.0.0.1:12111``.
+
+``POST /_fake/sessions/<id>/pay`` marks a session paid, in place of a
+customer completing the checkout page.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+SESSION_TTL = 24 * 60 * 60
+
+SESSIONS_URL = re.compile(r"^/v1/checkout/sessions/?$")
+SESSION_URL = re.compile(r"^/v1/checkout/sessions/(?P<id>[\w-]+)/?$")
+EXPIRE_URL = re.compile(r"^/v1/checkout/sessions/(?P<id>[\w-]+)/expire/?$")
+PAY_URL = re.compile(r"^/_fake/sessions/(?P<id>[\w-]+)/pay/?$")
+
+
+def parse_form(body: str) -> dict:
+    """Decode Stripe's ``a[b][0][c]=v`` form encoding into nested dicts"""
+    data = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = re.findall(r"[^\[\]]+", key)
+        target = data
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return data
+
+
+def _amount_total(params: dict) -> int:
+    total = 0
+    for item in params.get("line_items", {}).values():
+        unit_amount = int(item.get("price_data", {}).get("unit_amount", 0))
+        total += unit_amount * int(item.get("quantity", 1))
+    return total
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # Load tests open many connections at once, the default backlog is 5.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeStripeServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 12111,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.sessions = {}
+        self.requests = 0
+        self._idempotency_keys = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = _HTTPServer((host, port), self._handler_class())
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeStripeServer":
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _draw(self):
+        """Delay and failure of the next request, reproducible with a seed"""
+        with self._lock:
+            self.requests += 1
+            delay = max(
+                0.0, self.latency + self._random.uniform(-1, 1) * self.jitter
+            )
+            failed = self._random.random() < self.error_rate
+        return delay, failed
+
+    def create_session(self, params: dict, idempotency_key: str = None):
+        with self._lock:
+            if idempotency_key in self._idempotency_keys:
+                return self._idempotency_keys[idempotency_key]
+            session_id = f"cs_test_{uuid.uuid4().hex}"
+            session = {
+                "id": session_id,
+                "object": "checkout.session",
+                "amount_total": _amount_total(params),
+                "currency": "usd",
+                "expires_at": int(time.time()) + SESSION_TTL,
+                "mode": params.get("mode", "payment"),
+                "payment_status": "unpaid",
+                "status": "open",
+                "success_url": params.get("success_url"),
+                "cancel_url": params.get("cancel_url"),
+                "url": f"{self.url}/pay/{session_id}",
+            }
+            self.sessions[session_id] = session
+            if idempotency_key:
+                self._idempotency_keys[idempotency_key] = session
+            return session
+
+    def update_session(self, session_id: str, **changes):
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                session.update(changes)
+            return session
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode()
+                path = urlparse(self.path).path
+
+                delay, failed = server._draw()
+                time.sleep(delay)
+                if failed:
+                    return self._error(500, "api_error", "Injected failure")
+
+                if method == "POST" and SESSIONS_URL.match(path):
+                    return self._send(200, server.create_session(
+                        parse_form(body),
+                        self.headers.get("Idempotency-Key"),
+                    ))
+                if method == "POST" and (match := EXPIRE_URL.match(path)):
+                    return self._session(server.update_session(
+                        match["id"], status="expired"
+                    ))
+                if method == "POST" and (match := PAY_URL.match(path)):
+                    return self._session(server.update_session(
+                        match["id"], status="complete", payment_status="paid"
+                    ))
+                if method == "GET" and (match := SESSION_URL.match(path)):
+                    return self._session(server.sessions.get(match["id"]))
+                return self._error(404, "invalid_request_error", "Not found")
+
+            def _session(self, session):
+                if session is None:
+                    return self._error(
+                        404, "invalid_request_error", "No such checkout.session"
+                    )
+                return self._send(200, session)
+
+            def _error(self, status, error_type, message):
+                self._send(status, {
+                    "error": {"type": error_type, "message": message}
+                })
+
+            def _send(self, status, data):
+                content = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
@@ -0,0 +1,85 @@
+"""Nightly fine accrual for late returns.
+
+Fines are computed for all late returns in one query: the overdue days
+and the amount are SQL expressions over the borrowing's own columns
+(``daily_fee`` is snapshotted on the borrowing, so no join to books is
+needed). Payments are inserted with ``bulk_create`` together with their
+outbox events, the Stripe sessions are opened by the outbox dispatcher.
+Each batch locks its borrowings first, so only the fines this run inserted
+are counted and get a session.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import ExtractDay
+
+from borrowing.models import Borrowing, OutboxEvent
+from borrowing.outbox import enqueue, enqueue_many
+from library_api.streaming import chunked
+from payment.models import Payment
+from payment.stripe_session import FINE_MULTIPLIER
+
+BATCH_SIZE = 1000
+
+
+def fine_amounts():
+    """``(borrowing_id, amount)`` of late returns without a fine yet"""
+    fined = Payment.objects.filter(
+        borrowing=OuterRef("pk"), type=Payment.TypeChoices.FINE
+    )
+    overdue_days = ExtractDay(F("actual_return") - F("expected_return"))
+    return (
+        Borrowing.objects.filter(actual_return__gt=F("expected_return"))
+        .exclude(Exists(fined))
+        .annotate(
+            fine=(overdue_days * F("daily_fee") * FINE_MULTIPLIER)
+        )
+        .order_by("id")
+        .values_list("id", "fine")
+    )
+
+
+def accrue_fines(batch_size: int = BATCH_SIZE) -> tuple[int, Decimal]:
+    """Create the missing FINE payments, return their count and total"""
+    created, total = 0, Decimal(0)
+    for batch in chunked(fine_amounts().iterator(), batch_size):
+        borrowing_ids = [borrowing_id for borrowing_id, _ in batch]
+        with transaction.atomic():
+            # A concurrent run waits for these locks, then skips the fines
+            # this one inserted.
+            list(
+                Borrowing.objects.select_for_update()
+                .filter(pk__in=borrowing_ids)
+                .order_by("pk")
+                .values_list("pk")
+            )
+            fined = set(
+                Payment.objects.filter(
+                    borrowing_id__in=borrowing_ids,
+                    type=Payment.TypeChoices.FINE,
+                ).values_list("borrowing_id", flat=True)
+            )
+            payments = Payment.objects.bulk_create(
+                Payment(
+                    borrowing_id=borrowing_id,
+                    type=Payment.TypeChoices.FINE,
+                    status=Payment.StatusChoices.PENDING,
+                    money_to_pay=Decimal(fine).quantize(Decimal("0.01")),
+                )
+                for borrowing_id, fine in batch
+                if borrowing_id not in fined
+            )
+            enqueue_many(
+                OutboxEvent.KindChoices.PAYMENT_SESSION,
+                ({"payment_id": payment.pk} for payment in payments),
+            )
+        created += len(payments)
+        total += sum(payment.money_to_pay for payment in payments)
+
+    if created:
+        enqueue(
+            OutboxEvent.KindChoices.TELEGRAM_MESSAGE,
+            text=f"Accrued {created} fines for late returns, {total} USD.",
+        )
+    return created, total
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from payment.fake_stripe import FakeStripeServer
+
+
+class Command(BaseCommand):
+    """Django command that serves the local Stripe stand-in"""
+
+    help = "Run a fake Stripe Checkout API for offline and load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=12111)
+        parser.add_argument(
+            "--latency", type=float, default=0.0,
+            help="Mean response delay in seconds",
+        )
+        parser.add_argument(
+            "--jitter", type=float, default=0.0,
+            help="Maximum deviation from the mean delay in seconds",
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0.0,
+            help="Share of requests answered with a 500 error",
+        )
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        server = FakeStripeServer(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            seed=options["seed"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake Stripe listening on {server.url}, "
+            f"set STRIPE_API_BASE={server.url}"
+        ))
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.httpd.server_close()
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing", "0006_active_borrowing_indexes"),
+        ("payment", "0003_payment_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                condition=models.Q(("status", "PENDING")),
+                fields=["borrowing"],
+                name="payment_pending_borrowing_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="payment",
+            constraint=models.UniqueConstraint(
+                fields=("session_id",), name="payment_session_id_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+def expire_duplicate_pending_payments(apps, schema_editor):
+    """Keep the newest pending payment of each borrowing and type"""
+    Payment = apps.get_model("payment", "Payment")
+    pending = Payment.objects.filter(status="PENDING")
+    duplicates = (
+        pending.values("borrowing_id", "type")
+        .annotate(count=models.Count("id"), newest=models.Max("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        pending.filter(
+            borrowing_id=duplicate["borrowing_id"],
+            type=duplicate["type"],
+            id__lt=duplicate["newest"],
+        ).update(status="EXPIRED")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing", "0007_overdue_queue"),
+        ("payment", "0005_payment_expires_at"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="payment",
+            name="payment_pending_borrowing_idx",
+        ),
+        migrations.RunPython(
+            expire_duplicate_pending_payments, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="payment",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "PENDING")),
+                fields=("borrowing", "type"),
+                name="payment_one_pending_per_borrowing",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payment", "0006_one_pending_payment_per_borrowing"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="renewals",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:10
+
+from django.conf import settings
+from django.db import migrations
+
+TASK_NAME = "Accrue overdue fines"
+
+
+def schedule_fines(apps, schema_editor):
+    CrontabSchedule = apps.get_model("django_celery_beat", "CrontabSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    nightly, _ = CrontabSchedule.objects.get_or_create(
+        minute="0",
+        hour="2",
+        day_of_week="*",
+        day_of_month="*",
+        month_of_year="*",
+        timezone=settings.CELERY_TIMEZONE,
+    )
+    PeriodicTask.objects.update_or_create(
+        name=TASK_NAME,
+        defaults={
+            "task": "payment.tasks.accrue_overdue_fines",
+            "crontab": nightly,
+        },
+    )
+
+
+def unschedule_fines(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payment", "0007_payment_renewals"),
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_fines, unschedule_fines),
+    ]
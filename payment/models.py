@@ -23,6 +23,23 @@ class Payment(models.Model):
     session_url = models.URLField(max_length=500, blank=True, null=True)
     session_id = models.CharField(max_length=100, blank=True, null=True)
     money_to_pay = models.DecimalField(max_digits=10, decimal_places=2)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    renewals = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session_id"],
+                name="payment_session_id_unique",
+            ),
+            # Also serves the pending payment lookups by borrowing.
+            models.UniqueConstraint(
+                fields=["borrowing", "type"],
+                name="payment_one_pending_per_borrowing",
+                condition=models.Q(status="PENDING"),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.type}: {self.status} ({self.money_to_pay})"
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 
+from library_api.dynamic_fields import DynamicFieldsMixin
 from payment.models import Payment
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = (
@@ -18,7 +19,7 @@ class PaymentSerializer(serializers.ModelSerializer):
 
 
 class PaymentListSerializer(PaymentSerializer):
-    borrowing = serializers.CharField(source="borrowing.id", read_only=True)
+    borrowing = serializers.CharField(source="borrowing_id", read_only=True)
     user = serializers.CharField(
         source="borrowing.user.email",
         read_only=True,
@@ -35,6 +36,16 @@ class PaymentListSerializer(PaymentSerializer):
             "session_id",
             "money_to_pay",
         )
+        field_lookups = {
+            "borrowing": ("borrowing",),
+            "user": ("borrowing__user__email",),
+        }
+        expandable_fields = {
+            "borrowing": (
+                "borrowing.serializers.BorrowingListSerializer",
+                {"read_only": True},
+            ),
+        }
 
 
 class PaymentDetailSerializer(PaymentSerializer):
@@ -55,3 +66,13 @@ class PaymentDetailSerializer(PaymentSerializer):
             "session_id",
             "borrowing",
         )
+        field_lookups = {
+            "borrowing": ("borrowing__book__title",),
+            "user": ("borrowing__user__email",),
+        }
+        expandable_fields = {
+            "borrowing": (
+                "borrowing.serializers.BorrowingListSerializer",
+                {"read_only": True},
+            ),
+        }
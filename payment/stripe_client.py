@@ -0,0 +1,208 @@
+"""Shared Stripe client.
+
+One ``StripeClient`` per process keeps a pooled HTTP session, applies
+explicit connect / read timeouts and lets the Stripe library retry
+network errors with jittered exponential backoff. Retried POSTs reuse
+their idempotency key, so a retry never opens a second session.
+
+Calls go through a circuit breaker: after ``FAILURE_THRESHOLD`` failures
+in a row it opens and calls fail fast with ``CircuitOpenError`` for
+``RESET_TIMEOUT`` seconds, then a single trial call decides whether it
+closes again. Callers defer the work to the outbox meanwhile.
+
+Async views use the ``a``-prefixed methods, served by an httpx client so
+that waiting on Stripe does not hold a thread.
+"""
+import threading
+import time
+
+import httpx
+import requests
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+MAX_NETWORK_RETRIES = 2
+POOL_SIZE = 16
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+# Errors that say Stripe is unreachable or unhealthy, not that the
+# request itself was wrong.
+BREAKER_ERRORS = (
+    stripe.APIConnectionError,
+    stripe.APIError,
+    stripe.RateLimitError,
+)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Stripe circuit is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None and self.retry_after > 0
+
+    def call(self, func, *args, **kwargs):
+        self._start_call()
+        try:
+            result = func(*args, **kwargs)
+        except BREAKER_ERRORS:
+            self._record_failure()
+            raise
+        except Exception:
+            self._record_success()
+            raise
+        self._record_success()
+        return result
+
+    async def acall(self, func, *args, **kwargs):
+        self._start_call()
+        try:
+            result = await func(*args, **kwargs)
+        except BREAKER_ERRORS:
+            self._record_failure()
+            raise
+        except Exception:
+            self._record_success()
+            raise
+        self._record_success()
+        return result
+
+    def _start_call(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                if self.retry_after > 0 or self._trial_running:
+                    raise CircuitOpenError(self.retry_after)
+                self._trial_running = True
+
+    def _record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or (
+                self.failures >= self.failure_threshold
+            ):
+                self.opened_at = self.clock()
+
+    def _record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+
+class StripeClient:
+    def __init__(
+        self,
+        api_key: str,
+        api_base: str = None,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        max_network_retries: int = MAX_NETWORK_RETRIES,
+        breaker: CircuitBreaker = None,
+    ):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        connect_timeout, read_timeout = timeout
+        async_client = stripe.HTTPXClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+
+        self.breaker = breaker or CircuitBreaker()
+        self._client = stripe.StripeClient(
+            api_key,
+            base_addresses={"api": api_base} if api_base else {},
+            max_network_retries=max_network_retries,
+            http_client=stripe.RequestsClient(
+                timeout=timeout,
+                session=session,
+                async_fallback_client=async_client,
+            ),
+        )
+
+    def create_session(self, params: dict, idempotency_key: str):
+        return self.breaker.call(
+            self._client.checkout.sessions.create,
+            params=params,
+            options={"idempotency_key": idempotency_key},
+        )
+
+    def retrieve_session(self, session_id: str):
+        return self.breaker.call(
+            self._client.checkout.sessions.retrieve, session_id
+        )
+
+    def expire_session(self, session_id: str):
+        return self.breaker.call(
+            self._client.checkout.sessions.expire, session_id
+        )
+
+    async def acreate_session(self, params: dict, idempotency_key: str):
+        return await self.breaker.acall(
+            self._client.checkout.sessions.create_async,
+            params=params,
+            options={"idempotency_key": idempotency_key},
+        )
+
+    async def aretrieve_session(self, session_id: str):
+        return await self.breaker.acall(
+            self._client.checkout.sessions.retrieve_async, session_id
+        )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_stripe_client() -> StripeClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = StripeClient(
+                settings.STRIPE_SECRET_KEY, api_base=settings.STRIPE_API_BASE
+            )
+        return _client
+
+
+def reset_stripe_client() -> None:
+    """Drop the shared client, the next call builds a fresh one"""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting.startswith("STRIPE_"):
+        reset_stripe_client()
@@ -1,13 +1,17 @@
-import stripe
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone as django_timezone
 from rest_framework.reverse import reverse
 
 from payment.models import Payment
+from payment.stripe_client import CircuitOpenError, get_stripe_client
 from borrowing.models import Borrowing
 
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 FINE_MULTIPLIER = 2
 
 
@@ -15,38 +19,116 @@ def calculate_days_fee_amount(borrowing: Borrowing) -> int:
     days_fee = (
         borrowing.expected_return - borrowing.borrow_date
     ).days
-    fee_per_day = borrowing.book.daily_fee
-    return int(fee_per_day * days_fee * 100)
+    return int(borrowing.daily_fee * days_fee * 100)
 
 
 def calculate_days_of_overdue_amount(borrowing: Borrowing) -> int:
     days_of_overdue = (
-        borrowing.actual_return - borrowing.borrow_date
+        borrowing.actual_return - borrowing.expected_return
     ).days
-    daily_fee = borrowing.book.daily_fee
-    return int(daily_fee * FINE_MULTIPLIER * days_of_overdue * 100)
+    return int(borrowing.daily_fee * FINE_MULTIPLIER * days_of_overdue * 100)
 
 
-def create_stripe_session(borrowing: Borrowing) -> Payment:
+def _payment_details(
+    borrowing: Borrowing, payment_type: str = Payment.TypeChoices.PAYMENT
+) -> tuple[int, str]:
     book = borrowing.book
 
-    if (
-            borrowing.actual_return
-            and borrowing.actual_return > borrowing.expected_return
-    ):
-        days_fee = calculate_days_fee_amount(borrowing)
-        days_of_overdue = calculate_days_of_overdue_amount(borrowing)
-        total_amount = days_fee + days_of_overdue
-        name = (f"Payment for borrowing of {book.title} consists of"
-                f"expected fee - {days_fee} and "
-                f"overdue fee - {days_of_overdue}")
+    if payment_type == Payment.TypeChoices.FINE:
+        total_amount = calculate_days_of_overdue_amount(borrowing)
+        name = (f"Fine for overdue borrowing of {book.title}: "
+                f"returned {borrowing.actual_return}, "
+                f"expected {borrowing.expected_return}")
     else:
         total_amount = calculate_days_fee_amount(borrowing)
         name = f"Payment for borrowing of {book.title} is {total_amount}"
 
-    session = stripe.checkout.Session.create(
-        payment_method_types=["card"],
-        line_items=[
+    return total_amount, name
+
+
+def create_pending_payment(
+    borrowing: Borrowing, payment_type: str = Payment.TypeChoices.PAYMENT
+) -> Payment:
+    """Pending payment of a borrowing, created without a Stripe session.
+
+    A borrowing has at most one pending payment per type, an existing one
+    is returned instead of creating a duplicate.
+    """
+    total_amount, _ = _payment_details(borrowing, payment_type)
+
+    try:
+        with transaction.atomic():
+            return Payment.objects.create(
+                status=Payment.StatusChoices.PENDING,
+                borrowing=borrowing,
+                money_to_pay=total_amount / 100,
+                type=payment_type,
+            )
+    except IntegrityError:
+        return Payment.objects.get(
+            borrowing=borrowing,
+            type=payment_type,
+            status=Payment.StatusChoices.PENDING,
+        )
+
+
+def has_live_session(payment: Payment, total_amount: int) -> bool:
+    """Whether the payment's session is unexpired and for this amount"""
+    return bool(
+        payment.session_id
+        and (
+            payment.expires_at is None
+            or payment.expires_at > django_timezone.now()
+        )
+        and int(payment.money_to_pay * 100) == total_amount
+    )
+
+
+def attach_stripe_session(payment: Payment) -> Payment:
+    """Make sure a payment has a live Stripe checkout session.
+
+    A live session for the current amount is reused. Otherwise the
+    idempotency key is derived from the payment, the amount and the
+    session being replaced, so a retried call gets the session created by
+    the first one instead of opening another.
+    """
+    session_request = _session_request(payment)
+    if session_request is None:
+        return payment
+    params, idempotency_key = session_request
+    session = get_stripe_client().create_session(
+        params, idempotency_key=idempotency_key
+    )
+    return _store_session(payment, session)
+
+
+async def aattach_stripe_session(payment: Payment) -> Payment:
+    """``attach_stripe_session`` for async views"""
+    session_request = await sync_to_async(_session_request)(payment)
+    if session_request is None:
+        return payment
+    params, idempotency_key = session_request
+    session = await get_stripe_client().acreate_session(
+        params, idempotency_key=idempotency_key
+    )
+    return await sync_to_async(_store_session)(payment, session)
+
+
+def _session_request(payment: Payment):
+    """Stripe params and idempotency key, None if the session is live"""
+    total_amount, name = _payment_details(payment.borrowing, payment.type)
+    if has_live_session(payment, total_amount):
+        return None
+
+    # A reopened payment has no session left, its renewal count keeps the
+    # key apart from the one of its first session.
+    replaced = payment.session_id or (
+        f"renewal-{payment.renewals}" if payment.renewals else "new"
+    )
+    idempotency_key = f"payment-{payment.pk}-{total_amount}-{replaced}"
+    params = {
+        "payment_method_types": ["card"],
+        "line_items": [
             {
                 "price_data": {
                     "currency": "usd",
@@ -58,22 +140,96 @@ def create_stripe_session(borrowing: Borrowing) -> Payment:
                 "quantity": 1,
             }
         ],
-        mode="payment",
-        success_url=(settings.BASE_URL
-                     + reverse("payment:payment-success")
-                     + "?session_id={CHECKOUT_SESSION_ID}"),
-        cancel_url=settings.BASE_URL + reverse("payment:payment-cancel")
-
+        "mode": "payment",
+        "success_url": (settings.BASE_URL
+                        + reverse("payment:payment-success")
+                        + "?session_id={CHECKOUT_SESSION_ID}"),
+        "cancel_url": (settings.BASE_URL
+                       + reverse("payment:payment-cancel")),
+    }
+    return params, idempotency_key
+
+
+def _store_session(payment: Payment, session) -> Payment:
+    payment.session_id = session.id
+    payment.session_url = session.url
+    payment.money_to_pay = session.amount_total / 100
+    if session.expires_at:
+        payment.expires_at = datetime.fromtimestamp(
+            session.expires_at, tz=timezone.utc
+        )
+    payment.save(
+        update_fields=[
+            "session_id",
+            "session_url",
+            "money_to_pay",
+            "expires_at",
+            "updated_at",
+        ]
     )
 
-    payment = Payment.objects.create(
-        status=Payment.StatusChoices.PENDING,
-        borrowing=borrowing,
-        session_id=session.id,
-        session_url=session.url,
-        money_to_pay=session.amount_total / 100,
-        type=Payment.TypeChoices.PAYMENT,
+    return payment
 
-    )
 
+def attach_or_defer_stripe_session(payment: Payment) -> Payment:
+    """Open the session now, or leave it to the outbox if Stripe is down"""
+    try:
+        return attach_stripe_session(payment)
+    except CircuitOpenError:
+        _defer_stripe_session(payment)
+        return payment
+
+
+async def aattach_or_defer_stripe_session(payment: Payment) -> Payment:
+    try:
+        return await aattach_stripe_session(payment)
+    except CircuitOpenError:
+        await sync_to_async(_defer_stripe_session)(payment)
+        return payment
+
+
+def _defer_stripe_session(payment: Payment) -> None:
+    from borrowing.models import OutboxEvent
+    from borrowing.outbox import enqueue
+
+    enqueue(OutboxEvent.KindChoices.PAYMENT_SESSION, payment_id=payment.id)
+
+
+def renew_payment(payment: Payment) -> Payment:
+    """Reopen an expired payment with a new session.
+
+    If the borrowing got another pending payment of the same type in the
+    meantime, that one is reused. The expired session is dropped, so while
+    Stripe is down the payment has no ``session_url`` until the outbox
+    opens one.
+    """
+    return attach_or_defer_stripe_session(_reopen_payment(payment))
+
+
+async def arenew_payment(payment: Payment) -> Payment:
+    payment = await sync_to_async(_reopen_payment)(payment)
+    return await aattach_or_defer_stripe_session(payment)
+
+
+def _reopen_payment(payment: Payment) -> Payment:
+    try:
+        with transaction.atomic():
+            Payment.objects.filter(
+                pk=payment.pk, status=Payment.StatusChoices.EXPIRED
+            ).update(
+                status=Payment.StatusChoices.PENDING,
+                session_id=None,
+                session_url=None,
+                expires_at=None,
+                renewals=F("renewals") + 1,
+                updated_at=Now(),
+            )
+    except IntegrityError:
+        payment = Payment.objects.select_related("borrowing__book").get(
+            borrowing_id=payment.borrowing_id,
+            type=payment.type,
+            status=Payment.StatusChoices.PENDING,
+        )
+    else:
+        payment.refresh_from_db()
     return payment
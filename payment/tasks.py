@@ -1,26 +1,78 @@
-import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import stripe
 from celery import shared_task
-from dotenv import load_dotenv
-from borrowing.send_telegram_message import send_telegram_message
+from django.db.models import Q
+from django.utils import timezone
+from borrowing.models import OutboxEvent
+from borrowing.outbox import enqueue
+from library_api.streaming import chunked
+from payment.fines import accrue_fines
 from payment.models import Payment
+from payment.stripe_client import CircuitOpenError, get_stripe_client
+from payment.webhooks import mark_expired, mark_paid
 
-load_dotenv()
+POLL_WORKERS = 8
+POLL_BATCH_SIZE = 500
+
+
+def _session_state(session_id: str):
+    try:
+        session = get_stripe_client().retrieve_session(session_id)
+    except (stripe.StripeError, CircuitOpenError):
+        return session_id, None
+    if session.payment_status == "paid":
+        return session_id, Payment.StatusChoices.PAID
+    if session.expires_at and session.expires_at < int(time.time()):
+        return session_id, Payment.StatusChoices.EXPIRED
+    return session_id, Payment.StatusChoices.PENDING
 
 
 @shared_task
 def check_session_for_expiration():
-    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+    """Reconcile pending payments whose webhook events never arrived.
+
+    Payments are normally updated by the Stripe webhook, so this only has
+    to run at a low frequency. Sessions known to be still open are not
+    polled, the others are fetched concurrently in batches.
+    """
+    session_ids = Payment.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__lte=timezone.now()),
+        status=Payment.StatusChoices.PENDING,
+        session_id__isnull=False,
+    ).values_list("session_id", flat=True)
 
-    payments = Payment.objects.filter(status=Payment.StatusChoices.PENDING)
+    paid = expired = failed = 0
+    with ThreadPoolExecutor(max_workers=POLL_WORKERS) as executor:
+        for batch in chunked(session_ids.iterator(), POLL_BATCH_SIZE):
+            states = dict(executor.map(_session_state, batch))
+            failed += list(states.values()).count(None)
+            paid += mark_paid(
+                [
+                    session_id
+                    for session_id, state in states.items()
+                    if state == Payment.StatusChoices.PAID
+                ],
+                notify=False,
+            )
+            expired += mark_expired(
+                [
+                    session_id
+                    for session_id, state in states.items()
+                    if state == Payment.StatusChoices.EXPIRED
+                ],
+                notify=False,
+            )
 
-    for payment in payments:
-        session = stripe.checkout.Session.retrieve(payment.session_id)
+    if paid or expired or failed:
+        enqueue(
+            OutboxEvent.KindChoices.TELEGRAM_MESSAGE,
+            text=(f"Payment reconciliation: {paid} paid, "
+                  f"{expired} expired, {failed} could not be checked."),
+        )
 
-        if session.expires_at and session.expires_at < int(time.time()):
-            payment.status = Payment.StatusChoices.EXPIRED
-            payment.save()
-            message = f"Session {payment.session_id} is expired."
-            send_telegram_message(message)
+
+@shared_task
+def accrue_overdue_fines():
+    accrue_fines()
@@ -6,6 +6,7 @@ from payment.views import (
     PaymentSuccessView,
     PaymentCancelView,
     PaymentRenewView,
+    StripeWebhookView,
 )
 
 
@@ -17,6 +18,7 @@ urlpatterns = [
     path("success/", PaymentSuccessView.as_view(), name="payment-success"),
     path("cancel/", PaymentCancelView.as_view(), name="payment-cancel"),
     path("renew/", PaymentRenewView.as_view(), name="payment-renew"),
+    path("webhook/", StripeWebhookView.as_view(), name="payment-webhook"),
 ]
 
 app_name = "payment"
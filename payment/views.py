@@ -1,12 +1,20 @@
 import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import aget_object_or_404
 from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from borrowing.send_telegram_message import send_telegram_message
+from library_api.async_views import APIView as AsyncAPIView
+from library_api.conditional import ConditionalGetMixin
+from library_api.dynamic_fields import DynamicFieldsViewMixin
+from library_api.export import ExportMixin
 from payment.models import Payment
-from payment.stripe_session import create_stripe_session
+from payment.stripe_client import CircuitOpenError, get_stripe_client
+from payment.stripe_session import arenew_payment
+from payment.webhooks import handle_event, mark_paid
 from payment.serializers import (
     PaymentSerializer,
     PaymentListSerializer,
@@ -14,10 +22,34 @@ from payment.serializers import (
 )
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
-    queryset = Payment.objects.all()
+class PaymentViewSet(
+    ConditionalGetMixin,
+    DynamicFieldsViewMixin,
+    ExportMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Payment.objects.select_related(
+        "borrowing__user", "borrowing__book"
+    )
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Queries per action, including the JWT user lookup on a cache miss.
+    query_budgets = {"list": 3, "retrieve": 3}
+    export_fields = (
+        "id",
+        "status",
+        "type",
+        "borrowing_id",
+        "session_id",
+        "money_to_pay",
+        "updated_at",
+    )
+    export_filename = "payments"
+
+    def get_conditional_fields(self):
+        if self.action == "retrieve":
+            return "updated_at", "borrowing__book__updated_at"
+        return ("updated_at",)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -30,35 +62,71 @@ class PaymentViewSet(viewsets.ModelViewSet):
         queryset = self.queryset
         if not self.request.user.is_staff:
             queryset = queryset.filter(borrowing__user=self.request.user)
-        if self.action in ["list", "retrieve"]:
-            return queryset.select_related("borrowing")
-        return queryset
+        return self.optimize_queryset(queryset)
 
 
-class PaymentSuccessView(APIView):
+class PaymentSuccessView(AsyncAPIView):
     @extend_schema(
         summary="Get info about successful payment",
         description="Authenticated user can get info about successful payment"
     )
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         session_id = request.query_params.get("session_id")
-        payment = Payment.objects.get(session_id=session_id)
+        payment = await aget_object_or_404(Payment, session_id=session_id)
+
+        # The webhook usually gets here first, then Stripe is not asked again.
+        if payment.status != Payment.StatusChoices.PAID:
+            try:
+                session = await get_stripe_client().aretrieve_session(
+                    session_id
+                )
+            except CircuitOpenError as error:
+                return Response(
+                    {"detail": "Payment service is temporarily unavailable"},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": str(int(error.retry_after) + 1)},
+                )
+            if session.payment_status != "paid":
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+            await sync_to_async(mark_paid)([session_id])
+
+        data = await sync_to_async(self._serialize)(payment.pk)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _serialize(payment_id: int) -> dict:
+        payment = Payment.objects.select_related(
+            "borrowing__user", "borrowing__book"
+        ).get(pk=payment_id)
+        return PaymentDetailSerializer(payment).data
+
+
+class StripeWebhookView(APIView):
+    """Receives Stripe events, authenticated by their signature"""
+
+    authentication_classes = ()
+    permission_classes = [permissions.AllowAny]
+    # Stripe delivers bursts of events from a handful of IPs.
+    throttle_classes = ()
 
-        session = stripe.checkout.Session.retrieve(session_id)
-
-        if session.payment_status == "paid":
-            serializer = PaymentDetailSerializer(
-                payment, data={"status": "PAID"}, partial=True
+    @extend_schema(
+        request=None,
+        summary="Stripe webhook",
+        description="Marks payments paid or expired from Stripe "
+                    "checkout.session events",
+    )
+    def post(self, request, *args, **kwargs):
+        try:
+            event = stripe.Webhook.construct_event(
+                request.body,
+                request.headers.get("Stripe-Signature", ""),
+                settings.STRIPE_WEBHOOK_SECRET,
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
 
-            message = (f"Your borrowing book: "
-                       f"{payment.borrowing.book.title} is paid")
-            send_telegram_message(message)
-
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        updated = handle_event(event)
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
 
 
 class PaymentCancelView(APIView):
@@ -76,22 +144,35 @@ class PaymentCancelView(APIView):
         )
 
 
-class PaymentRenewView(APIView):
+class PaymentRenewView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
         summary="Get info about renewal payment",
         description="Authenticated user can get info about renewal payment"
     )
-    def get(self, request, *args, **kwargs):
-        payment = Payment.objects.filter(
+    async def get(self, request, *args, **kwargs):
+        payment = await Payment.objects.select_related(
+            "borrowing__book"
+        ).filter(
             status=Payment.StatusChoices.EXPIRED,
             borrowing__user=self.request.user,
-        ).first()
+        ).afirst()
         if payment:
-            create_stripe_session(payment.borrowing)
+            payment = await arenew_payment(payment)
+            if payment.session_url is None:
+                return Response(
+                    {
+                        "status": "This payment has renewed, the payment "
+                                  "session will be opened shortly",
+                    },
+                    status=status.HTTP_202_ACCEPTED,
+                )
             return Response(
-                {"status": "This payment has renewed successfully"},
+                {
+                    "status": "This payment has renewed successfully",
+                    "session_url": payment.session_url,
+                },
                 status=status.HTTP_200_OK,
             )
         return Response(
@@ -0,0 +1,70 @@
+"""Handlers for Stripe webhook events.
+
+Every handler is a conditional ``UPDATE ... WHERE status = 'PENDING'``,
+so redelivered or out of order events are no-ops and only the first
+delivery that changes a payment records a notification.
+"""
+from django.db import transaction
+from django.db.models.functions import Now
+
+from borrowing.models import OutboxEvent
+from borrowing.outbox import enqueue
+from payment.models import Payment
+
+
+def _lock_pending_payments(session_ids):
+    # Concurrent deliveries of one event wait here and then find the
+    # payment already updated.
+    return Payment.objects.select_for_update(of=("self",)).filter(
+        session_id__in=session_ids, status=Payment.StatusChoices.PENDING
+    )
+
+
+def mark_paid(session_ids, notify: bool = True) -> int:
+    with transaction.atomic():
+        payments = list(
+            _lock_pending_payments(session_ids)
+            .select_related("borrowing__book")
+            .only("id", "borrowing__book__title")
+        )
+        updated = Payment.objects.filter(
+            pk__in=[payment.pk for payment in payments]
+        ).update(status=Payment.StatusChoices.PAID, updated_at=Now())
+        for payment in payments if notify else ():
+            enqueue(
+                OutboxEvent.KindChoices.TELEGRAM_MESSAGE,
+                text=(f"Your borrowing book: "
+                      f"{payment.borrowing.book.title} is paid"),
+            )
+    return updated
+
+
+def mark_expired(session_ids, notify: bool = True) -> int:
+    with transaction.atomic():
+        payments = list(
+            _lock_pending_payments(session_ids).only("id", "session_id")
+        )
+        updated = Payment.objects.filter(
+            pk__in=[payment.pk for payment in payments]
+        ).update(status=Payment.StatusChoices.EXPIRED, updated_at=Now())
+        for payment in payments if notify else ():
+            enqueue(
+                OutboxEvent.KindChoices.TELEGRAM_MESSAGE,
+                text=f"Session {payment.session_id} is expired.",
+            )
+    return updated
+
+
+def handle_event(event) -> int:
+    """Apply a verified Stripe event, return the number of updated payments"""
+    session = event["data"]["object"]
+    if event["type"] in (
+        "checkout.session.completed",
+        "checkout.session.async_payment_succeeded",
+    ):
+        if session.get("payment_status") != "paid":
+            return 0
+        return mark_paid([session["id"]])
+    if event["type"] == "checkout.session.expired":
+        return mark_expired([session["id"]])
+    return 0
@@ -0,0 +1,138 @@
+"""Concurrency of the async payment views against a slow Stripe.
+
+A thread-per-request server handles at most as many requests at once as
+it has threads, so the same load is run twice through the ASGI stack:
+once capped at ``THREADS`` requests in flight, as a threaded worker
+would be, and once with ``CONCURRENCY`` requests in flight. The test
+client runs the queries of all requests on one connection, so the Stripe
+latency is set high enough to outweigh the database time.
+
+Not collected by the default test run, start it explicitly:
+    python manage.py test tests.benchmarks_asgi
+"""
+import asyncio
+import logging
+from datetime import date, timedelta
+from time import perf_counter
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework.reverse import reverse
+
+from book.models import Book
+from borrowing.models import Borrowing
+from payment.fake_stripe import FakeStripeServer
+from payment.models import Payment
+from payment.stripe_client import reset_stripe_client
+
+REQUESTS = 100
+THREADS = 8
+CONCURRENCY = 100
+STRIPE_LATENCY = 0.5
+
+
+class AsyncViewsBenchmark(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeStripeServer(port=0, latency=STRIPE_LATENCY).start()
+        cls.overrides = override_settings(
+            STRIPE_API_BASE=cls.server.url,
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": {
+                    **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"],
+                    "anon": f"{REQUESTS * 10}/min",
+                },
+            },
+        )
+        cls.overrides.enable()
+        # The test client runs every request on the same connection, so the
+        # per-request query counts mix concurrent requests.
+        logging.getLogger("library_api.query_count").setLevel(logging.ERROR)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.getLogger("library_api.query_count").setLevel(logging.NOTSET)
+        cls.overrides.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def paid_sessions(self, count: int) -> list:
+        user = get_user_model().objects.create_user(
+            email=f"bench{Payment.objects.count()}@test.com", password="x"
+        )
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover=Book.CoverChoices.HARD,
+            inventory=count,
+            daily_fee=1,
+        )
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                user=user,
+                book=book,
+                expected_return=date.today() + timedelta(days=7),
+                daily_fee=book.daily_fee,
+            )
+            for _ in range(count)
+        )
+
+        session_ids = []
+        for _ in borrowings:
+            session = self.server.create_session({"mode": "payment"})
+            self.server.update_session(
+                session["id"], status="complete", payment_status="paid"
+            )
+            session_ids.append(session["id"])
+        Payment.objects.bulk_create(
+            Payment(
+                borrowing=borrowing,
+                session_id=session_id,
+                money_to_pay=7,
+                status=Payment.StatusChoices.PENDING,
+                type=Payment.TypeChoices.PAYMENT,
+            )
+            for borrowing, session_id in zip(borrowings, session_ids)
+        )
+        return session_ids
+
+    def run_load(self, session_ids: list, in_flight: int) -> float:
+        # Every run gets its own event loop, and so its own HTTP pool.
+        reset_stripe_client()
+        url = reverse("payment:payment-success")
+
+        async def load():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(in_flight)
+
+            async def request(session_id):
+                async with slots:
+                    res = await client.get(url, {"session_id": session_id})
+                self.assertEqual(res.status_code, 200)
+
+            await asyncio.gather(*map(request, session_ids))
+
+        start = perf_counter()
+        async_to_sync(load)()
+        return perf_counter() - start
+
+    def test_concurrency_scales_past_thread_count(self):
+        threaded = self.run_load(self.paid_sessions(REQUESTS), THREADS)
+        concurrent = self.run_load(self.paid_sessions(REQUESTS), CONCURRENCY)
+
+        self.assertFalse(
+            Payment.objects.filter(
+                status=Payment.StatusChoices.PENDING
+            ).exists()
+        )
+        self.assertLess(concurrent * 2, threaded)
+        print(
+            f"\nGET /payments/success/ x {REQUESTS}, "
+            f"{STRIPE_LATENCY * 1000:.0f}ms Stripe latency:"
+            f"\n{THREADS} in flight: {REQUESTS / threaded:.1f} req/s"
+            f"\n{CONCURRENCY} in flight: {REQUESTS / concurrent:.1f} req/s"
+        )
@@ -0,0 +1,95 @@
+"""Checkout throughput and tail latency against the local Stripe stand-in.
+
+Not collected by the default test run, start it explicitly:
+    python manage.py test tests.benchmarks_checkout
+"""
+from datetime import date, timedelta
+from statistics import quantiles
+from time import perf_counter
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from book.models import Book
+from borrowing import outbox
+from borrowing.models import OutboxEvent
+from payment.fake_stripe import FakeStripeServer
+from payment.models import Payment
+
+CHECKOUTS = 200
+STRIPE_LATENCY = 0.05
+STRIPE_JITTER = 0.03
+SEED = 1
+
+
+def percentiles(samples):
+    cuts = quantiles(samples, n=100)
+    return cuts[49], cuts[94], cuts[98]
+
+
+@mock.patch("borrowing.notifier.TelegramNotifier.enqueue")
+class CheckoutBenchmark(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeStripeServer(
+            port=0, latency=STRIPE_LATENCY, jitter=STRIPE_JITTER, seed=SEED
+        ).start()
+        cls.fake_stripe = override_settings(STRIPE_API_BASE=cls.server.url)
+        cls.fake_stripe.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake_stripe.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def test_checkout(self, send_message):
+        client = APIClient()
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover=Book.CoverChoices.HARD,
+            inventory=CHECKOUTS,
+            daily_fee=1.5,
+        )
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"bench{index}@test.com", password="x")
+            for index in range(CHECKOUTS)
+        )
+
+        timings = []
+        for user in users:
+            client.force_authenticate(user)
+            start = perf_counter()
+            res = client.post(
+                reverse("borrowing:borrowing-list"),
+                {
+                    "book": book.id,
+                    "expected_return": date.today() + timedelta(days=7),
+                },
+            )
+            timings.append(perf_counter() - start)
+            self.assertEqual(res.status_code, 201)
+
+        start = perf_counter()
+        while outbox.dispatch():
+            pass
+        dispatch_time = perf_counter() - start
+
+        self.assertFalse(
+            OutboxEvent.objects.filter(processed_at__isnull=True).exists()
+        )
+        self.assertFalse(
+            Payment.objects.filter(session_id__isnull=True).exists()
+        )
+        p50, p95, p99 = percentiles(timings)
+        print(
+            f"\nPOST /borrowings/ x {CHECKOUTS}: p50 {p50 * 1000:.1f}ms, "
+            f"p95 {p95 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms"
+            f"\nOutbox dispatch: {CHECKOUTS / dispatch_time:.1f} sessions/s "
+            f"with {STRIPE_LATENCY * 1000:.0f}ms Stripe latency"
+        )
@@ -0,0 +1,139 @@
+"""EXPLAIN plans of the hot borrowing / payment filters with and without
+their supporting indexes.
+
+Not collected by the default test run, start it explicitly:
+    python manage.py test tests.benchmarks_indexes
+"""
+from datetime import date, timedelta
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from book.models import Book
+from borrowing.models import Borrowing
+from payment.models import Payment
+
+ROWS = 200_000
+USERS = 2_000
+BATCH_SIZE = 10_000
+
+
+class IndexPlanBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"bench{index}@test.com", password="x")
+            for index in range(USERS)
+        )
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover=Book.CoverChoices.HARD,
+            inventory=ROWS,
+            daily_fee=1.5,
+        )
+        today = date.today()
+        # Nine borrowings out of ten are returned and paid for.
+        borrowings = Borrowing.objects.bulk_create(
+            (
+                Borrowing(
+                    book=book,
+                    user=cls.users[index % USERS],
+                    daily_fee=book.daily_fee,
+                    borrow_date=today - timedelta(days=index % 365 + 10),
+                    expected_return=today - timedelta(days=index % 365),
+                    actual_return=(
+                        None if index % 10 == 0 else today - timedelta(days=1)
+                    ),
+                )
+                for index in range(ROWS)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        Payment.objects.bulk_create(
+            (
+                Payment(
+                    borrowing=borrowing,
+                    status=(
+                        Payment.StatusChoices.PENDING
+                        if borrowing.actual_return is None
+                        else Payment.StatusChoices.PAID
+                    ),
+                    type=Payment.TypeChoices.PAYMENT,
+                    session_id=f"cs_bench_{borrowing.id}",
+                    money_to_pay=15,
+                )
+                for borrowing in borrowings
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        with connection.cursor() as cursor:
+            # Run the deferred FK checks now, ALTER TABLE refuses to run
+            # while they are pending.
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute("ANALYZE")
+
+    def compare(self, label, queryset, drop_sql):
+        with_index = self.explain(queryset)
+        with connection.cursor() as cursor:
+            for sql in drop_sql:
+                cursor.execute(sql)
+            cursor.execute("ANALYZE")
+        without_index = self.explain(queryset)
+
+        print(f"\n{label}\n--- with index ---\n{with_index}")
+        print(f"--- without index ---\n{without_index}")
+
+    @staticmethod
+    def explain(queryset):
+        start = perf_counter()
+        plan = queryset.explain(analyze=True)
+        return f"{plan}\n(explain took {perf_counter() - start:.3f}s)"
+
+    def test_active_borrowings_of_user(self):
+        self.compare(
+            "Active borrowings of a user",
+            Borrowing.objects.filter(
+                user=self.users[0], actual_return__isnull=True
+            ).order_by("-borrow_date", "-id")[:50],
+            [
+                "DROP INDEX borrowing_active_user_idx",
+                "DROP INDEX borrowing_user_date_id_idx",
+            ],
+        )
+
+    def test_overdue_borrowings(self):
+        self.compare(
+            "Overdue queue",
+            Borrowing.objects.filter(
+                expected_return__lte=date.today() - timedelta(days=360),
+                actual_return__isnull=True,
+                overdue_notified_at__isnull=True,
+            ).order_by("expected_return", "id")[:50],
+            [
+                "DROP INDEX borrowing_overdue_queue_idx",
+                "DROP INDEX borrowing_active_user_idx",
+            ],
+        )
+
+    def test_pending_payments_of_user(self):
+        self.compare(
+            "Pending payments of a user",
+            Payment.objects.filter(
+                borrowing__user=self.users[0],
+                status=Payment.StatusChoices.PENDING,
+            ),
+            ["DROP INDEX payment_one_pending_per_borrowing"],
+        )
+
+    def test_payment_by_session_id(self):
+        self.compare(
+            "Payment by session id",
+            Payment.objects.filter(session_id="cs_bench_12345"),
+            [
+                "ALTER TABLE payment_payment "
+                "DROP CONSTRAINT payment_session_id_unique"
+            ],
+        )
@@ -0,0 +1,88 @@
+"""Fast-path vs DRF list serialization.
+
+Not collected by the default test run, start it explicitly:
+    python manage.py test tests.benchmarks_serializers
+"""
+from datetime import date, timedelta
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from book.models import Book
+from book.serializers import BookListSerializer, BookListValuesSerializer
+from borrowing.models import Borrowing
+from borrowing.serializers import (
+    BorrowingListSerializer,
+    BorrowingListValuesSerializer,
+)
+
+ROW_COUNTS = (10_000, 100_000)
+
+
+def timed(func):
+    start = perf_counter()
+    result = func()
+    return perf_counter() - start, result
+
+
+class ListSerializationBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(
+            email="bench@test.com",
+            password="testpassword",
+        )
+        books = Book.objects.bulk_create(
+            Book(
+                title=f"Book {index}",
+                author=f"Author {index % 500}",
+                cover=Book.CoverChoices.HARD,
+                inventory=5,
+                daily_fee=1.5,
+            )
+            for index in range(max(ROW_COUNTS))
+        )
+        Borrowing.objects.bulk_create(
+            Borrowing(
+                book=book,
+                user=user,
+                daily_fee=book.daily_fee,
+                expected_return=date.today() + timedelta(days=7),
+            )
+            for book in books
+        )
+
+    def compare(self, label, queryset, serializer_class, fast_class):
+        for rows in ROW_COUNTS:
+            instances = list(queryset[:rows])
+            fast = fast_class()
+            values = list(queryset.values(*fast.lookups)[:rows])
+
+            drf_time, expected = timed(
+                lambda: serializer_class(instances, many=True).data
+            )
+            fast_time, actual = timed(lambda: fast.serialize(values))
+
+            self.assertEqual(actual, expected)
+            print(
+                f"\n{label} x {rows}: drf {drf_time:.3f}s, "
+                f"fast {fast_time:.3f}s, "
+                f"speedup {drf_time / fast_time:.1f}x"
+            )
+
+    def test_book_list(self):
+        self.compare(
+            "BookList",
+            Book.objects.order_by("id"),
+            BookListSerializer,
+            BookListValuesSerializer,
+        )
+
+    def test_borrowing_list(self):
+        self.compare(
+            "BorrowingList",
+            Borrowing.objects.select_related("book", "user").order_by("id"),
+            BorrowingListSerializer,
+            BorrowingListValuesSerializer,
+        )
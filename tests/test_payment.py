@@ -1,18 +1,44 @@
+import hashlib
+import hmac
+import json
+import time
 from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import count
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import stripe
 from django.contrib.auth import get_user_model
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.urls import reverse
+from django_celery_beat.models import PeriodicTask
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
 from book.models import Book
 from payment.models import Payment
-from borrowing.models import Borrowing
+from payment.fake_stripe import FakeStripeServer
+from payment.fines import accrue_fines
+from payment.stripe_client import (
+    FAILURE_THRESHOLD,
+    CircuitBreaker,
+    CircuitOpenError,
+    get_stripe_client,
+    reset_stripe_client,
+)
+from payment.stripe_session import (
+    attach_or_defer_stripe_session,
+    attach_stripe_session,
+    calculate_days_of_overdue_amount,
+    create_pending_payment,
+    renew_payment,
+)
+from payment.tasks import check_session_for_expiration
+from borrowing.models import Borrowing, OutboxEvent
 from payment.serializers import (
     PaymentSerializer,
     PaymentListSerializer,
@@ -20,11 +46,18 @@ from payment.serializers import (
 )
 
 PAYMENT_URL = reverse("payment:payment-list")
+WEBHOOK_URL = reverse("payment:payment-webhook")
+WEBHOOK_SECRET = "whsec_test"
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+# Title and author are unique together.
+BOOK_NUMBERS = count(1)
 
 
 def sample_book(**params):
     defaults = {
-        "title": "Test Book",
+        "title": f"Test Book {next(BOOK_NUMBERS)}",
         "author": "Test Author",
         "cover": "Test Cover",
         "inventory": 3,
@@ -91,9 +124,438 @@ class AuthenticatedPaymentApiTests(TestCase):
         )
 
     def test_user_can_see_only_own_payments(self):
-        payments = Payment.objects.filter(borrowing__user=self.user_1)
+        payments = Payment.objects.filter(
+            borrowing__user=self.user_1
+        ).order_by("-id")
         res = self.client.get(PAYMENT_URL)
         serializer = PaymentListSerializer(payments, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
-        self.assertEqual(len(res.data), payments.count())
+        self.assertEqual(res.data["results"], serializer.data)
+        self.assertEqual(len(res.data["results"]), payments.count())
+
+    def test_payment_detail_sparse_fields(self) -> None:
+        payment = Payment.objects.filter(borrowing__user=self.user_1).first()
+        res = self.client.get(
+            reverse("payment:payment-detail", args=[payment.id]),
+            {"fields": "status,money_to_pay"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data), {"status", "money_to_pay"})
+
+
+def signed_event(name: str, session_id: str) -> tuple[str, str]:
+    """Recorded Stripe event for a session, with its signature header"""
+    event = json.loads((FIXTURES_DIR / f"{name}.json").read_text())
+    event["data"]["object"]["id"] = session_id
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(),
+        f"{timestamp}.{payload}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return payload, f"t={timestamp},v1={signature}"
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            "test1@test.com",
+            "password_test",
+        )
+        self.payment = sample_borrowing(user=user).payments.get()
+        self.payment.session_id = "cs_test_webhook"
+        self.payment.save()
+        OutboxEvent.objects.all().delete()
+
+    def post_event(self, name: str, signature: str = None):
+        payload, header = signed_event(name, self.payment.session_id)
+        return self.client.post(
+            WEBHOOK_URL,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature or header,
+        )
+
+    def test_completed_event_marks_payment_paid_once(self):
+        first = self.post_event("stripe_checkout_session_completed")
+        second = self.post_event("stripe_checkout_session_completed")
+
+        self.payment.refresh_from_db()
+        self.assertEqual(first.data, {"updated": 1})
+        self.assertEqual(second.data, {"updated": 0})
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PAID)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_expired_event_marks_payment_expired(self):
+        res = self.post_event("stripe_checkout_session_expired")
+
+        self.payment.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.payment.status, Payment.StatusChoices.EXPIRED)
+
+    def test_status_change_updates_timestamp(self):
+        # Conditional GET validators are built from updated_at.
+        updated_at = self.payment.updated_at
+
+        self.post_event("stripe_checkout_session_completed")
+
+        self.payment.refresh_from_db()
+        self.assertNotEqual(self.payment.updated_at, updated_at)
+
+    def test_expired_event_does_not_undo_payment(self):
+        self.post_event("stripe_checkout_session_completed")
+        self.post_event("stripe_checkout_session_expired")
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PAID)
+
+    def test_invalid_signature_rejected(self):
+        res = self.post_event(
+            "stripe_checkout_session_completed", signature="t=1,v1=bad"
+        )
+
+        self.payment.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+
+
+class SessionReconciliationTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            "test1@test.com",
+            "password_test",
+        )
+        now = timezone.now()
+        self.payments = {}
+        for session_id, expires_at in (
+            ("cs_open", now + timedelta(hours=1)),
+            ("cs_paid", now - timedelta(hours=1)),
+            ("cs_expired", now - timedelta(hours=1)),
+        ):
+            payment = sample_borrowing(user=user).payments.get()
+            payment.session_id = session_id
+            payment.expires_at = expires_at
+            payment.save()
+            self.payments[session_id] = payment
+        OutboxEvent.objects.all().delete()
+
+    @patch("payment.stripe_client.StripeClient.retrieve_session")
+    def test_only_lapsed_sessions_are_polled(self, retrieve):
+        expired_at = int(time.time()) - 3600
+        retrieve.side_effect = lambda session_id: MagicMock(
+            payment_status="paid" if session_id == "cs_paid" else "unpaid",
+            expires_at=expired_at,
+        )
+
+        check_session_for_expiration()
+
+        self.assertEqual(
+            sorted(call.args[0] for call in retrieve.call_args_list),
+            ["cs_expired", "cs_paid"],
+        )
+        statuses = dict(
+            Payment.objects.filter(
+                session_id__in=self.payments
+            ).values_list("session_id", "status")
+        )
+        self.assertEqual(
+            statuses,
+            {"cs_open": "PENDING", "cs_paid": "PAID", "cs_expired": "EXPIRED"},
+        )
+        self.assertEqual(
+            list(OutboxEvent.objects.values_list("payload", flat=True)),
+            [{"text": "Payment reconciliation: 1 paid, 1 expired, "
+                      "0 could not be checked."}],
+        )
+
+
+class FakeStripeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeStripeServer(port=0).start()
+        cls.fake_stripe = override_settings(STRIPE_API_BASE=cls.server.url)
+        cls.fake_stripe.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake_stripe.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test1@test.com",
+            "password_test",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.payment = sample_borrowing(user=self.user).payments.get()
+        self.server.error_rate = 0.0
+        reset_stripe_client()
+
+    def test_session_is_created_once(self):
+        attach_stripe_session(self.payment)
+        session_id = self.payment.session_id
+        self.payment.session_id = None
+        attach_stripe_session(self.payment)
+
+        self.assertEqual(self.payment.session_id, session_id)
+        self.assertEqual(
+            self.server.sessions[session_id]["amount_total"], 1500
+        )
+
+    def test_live_session_is_reused(self):
+        attach_stripe_session(self.payment)
+        requests = self.server.requests
+
+        attach_stripe_session(self.payment)
+
+        self.assertEqual(self.server.requests, requests)
+
+    def test_one_pending_payment_per_borrowing(self):
+        payment = create_pending_payment(self.payment.borrowing)
+
+        self.assertEqual(payment, self.payment)
+        self.assertEqual(self.payment.borrowing.payments.count(), 1)
+
+    def test_renew_reopens_expired_payment(self):
+        attach_stripe_session(self.payment)
+        expired_session = self.payment.session_id
+        sessions = len(self.server.sessions)
+        Payment.objects.filter(pk=self.payment.pk).update(
+            status=Payment.StatusChoices.EXPIRED,
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        res = self.client.get(reverse("payment:payment-renew"))
+        second = self.client.get(reverse("payment:payment-renew"))
+
+        self.payment.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+        self.assertNotEqual(self.payment.session_id, expired_session)
+        self.assertEqual(res.data["session_url"], self.payment.session_url)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(len(self.server.sessions), sessions + 1)
+
+    def test_success_view_marks_paid_session(self):
+        attach_stripe_session(self.payment)
+        self.server.update_session(
+            self.payment.session_id, status="complete", payment_status="paid"
+        )
+
+        res = self.client.get(
+            reverse("payment:payment-success"),
+            {"session_id": self.payment.session_id},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["status"], Payment.StatusChoices.PAID)
+
+    def test_injected_errors_are_raised(self):
+        self.server.error_rate = 1.0
+
+        with self.assertRaises(stripe.APIError):
+            attach_stripe_session(self.payment)
+        self.assertIsNone(self.payment.session_id)
+
+    def test_open_circuit_defers_session_to_outbox(self):
+        self.server.error_rate = 1.0
+        OutboxEvent.objects.all().delete()
+        for _ in range(FAILURE_THRESHOLD):
+            with self.assertRaises(stripe.APIError):
+                attach_stripe_session(self.payment)
+        requests = self.server.requests
+
+        attach_or_defer_stripe_session(self.payment)
+
+        self.assertEqual(self.server.requests, requests)
+        self.assertIsNone(self.payment.session_id)
+        self.assertEqual(
+            OutboxEvent.objects.get().payload, {"payment_id": self.payment.id}
+        )
+
+    def test_renew_with_open_circuit_updates_timestamp(self):
+        Payment.objects.filter(pk=self.payment.pk).update(
+            status=Payment.StatusChoices.EXPIRED,
+            updated_at=timezone.now() - timedelta(days=1),
+        )
+        self.server.error_rate = 1.0
+        for _ in range(FAILURE_THRESHOLD):
+            with self.assertRaises(stripe.APIError):
+                attach_stripe_session(self.payment)
+
+        payment = renew_payment(self.payment)
+
+        self.assertEqual(payment.status, Payment.StatusChoices.PENDING)
+        self.assertGreater(
+            payment.updated_at, timezone.now() - timedelta(days=1)
+        )
+
+    def test_renew_with_open_circuit_drops_expired_session(self):
+        attach_stripe_session(self.payment)
+        Payment.objects.filter(pk=self.payment.pk).update(
+            status=Payment.StatusChoices.EXPIRED,
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        self.server.error_rate = 1.0
+        for _ in range(FAILURE_THRESHOLD):
+            with self.assertRaises(stripe.APIError):
+                get_stripe_client().retrieve_session("cs_missing")
+
+        res = self.client.get(reverse("payment:payment-renew"))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotIn("session_url", res.data)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+        self.assertIsNone(self.payment.session_id)
+        self.assertIsNone(self.payment.session_url)
+        self.assertIsNone(self.payment.expires_at)
+
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=30, clock=lambda: self.now
+        )
+
+    @staticmethod
+    def fail():
+        raise stripe.APIConnectionError("timeout")
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            with self.assertRaises(stripe.APIConnectionError):
+                self.breaker.call(self.fail)
+
+        with self.assertRaises(CircuitOpenError) as error:
+            self.breaker.call(lambda: "ok")
+        self.assertEqual(error.exception.retry_after, 30)
+
+    def test_request_errors_do_not_open_circuit(self):
+        for _ in range(3):
+            with self.assertRaises(stripe.InvalidRequestError):
+                self.breaker.call(
+                    MagicMock(side_effect=stripe.InvalidRequestError("x", None))
+                )
+
+        self.assertFalse(self.breaker.is_open)
+
+    def test_trial_call_after_timeout_closes_circuit(self):
+        for _ in range(2):
+            with self.assertRaises(stripe.APIConnectionError):
+                self.breaker.call(self.fail)
+        self.now = 31
+
+        self.assertEqual(self.breaker.call(lambda: "ok"), "ok")
+        self.assertFalse(self.breaker.is_open)
+
+    def test_failed_trial_reopens_circuit(self):
+        for _ in range(2):
+            with self.assertRaises(stripe.APIConnectionError):
+                self.breaker.call(self.fail)
+        self.now = 31
+
+        with self.assertRaises(stripe.APIConnectionError):
+            self.breaker.call(self.fail)
+        self.assertTrue(self.breaker.is_open)
+
+
+class FineAccrualTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "test1@test.com",
+            "password_test",
+        )
+        self.today = datetime.now().date()
+
+    def returned_borrowing(self, days_late: int) -> Borrowing:
+        return sample_borrowing(
+            user=self.user,
+            borrow_date=self.today - timedelta(days=20),
+            expected_return=self.today - timedelta(days=10),
+            actual_return=self.today - timedelta(days=10 - days_late),
+        )
+
+    def test_fines_accrued_for_late_returns_only(self):
+        late = self.returned_borrowing(days_late=3)
+        self.returned_borrowing(days_late=0)
+        sample_borrowing(
+            user=self.user,
+            borrow_date=self.today - timedelta(days=20),
+            expected_return=self.today - timedelta(days=10),
+        )
+        # The fee is the one in effect when the book was borrowed.
+        Book.objects.filter(pk=late.book_id).update(daily_fee=100)
+        OutboxEvent.objects.all().delete()
+
+        created, total = accrue_fines()
+
+        fine = Payment.objects.get(type=Payment.TypeChoices.FINE)
+        self.assertEqual((created, total), (1, fine.money_to_pay))
+        self.assertEqual(fine.borrowing, late)
+        self.assertEqual(fine.money_to_pay, Decimal("9.00"))
+        self.assertEqual(
+            list(
+                OutboxEvent.objects.order_by("id").values_list(
+                    "kind", flat=True
+                )
+            ),
+            ["PAYMENT_SESSION", "TELEGRAM_MESSAGE"],
+        )
+
+    def test_fines_are_accrued_once(self):
+        self.returned_borrowing(days_late=2)
+
+        accrue_fines()
+        Payment.objects.filter(type=Payment.TypeChoices.FINE).update(
+            status=Payment.StatusChoices.PAID
+        )
+
+        self.assertEqual(accrue_fines(), (0, 0))
+        self.assertEqual(
+            Payment.objects.filter(type=Payment.TypeChoices.FINE).count(), 1
+        )
+
+    def test_fines_of_a_concurrent_run_are_not_counted(self):
+        late = self.returned_borrowing(days_late=2)
+        accrue_fines()
+        OutboxEvent.objects.all().delete()
+
+        # Selected before the other run committed its fine.
+        with patch("payment.fines.fine_amounts") as fine_amounts:
+            fine_amounts.return_value.iterator.return_value = iter(
+                [(late.pk, Decimal(4))]
+            )
+            self.assertEqual(accrue_fines(), (0, 0))
+
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(
+            Payment.objects.filter(type=Payment.TypeChoices.FINE).count(), 1
+        )
+
+    def test_fines_are_accrued_nightly(self):
+        task = PeriodicTask.objects.get(
+            task="payment.tasks.accrue_overdue_fines"
+        )
+
+        self.assertTrue(task.enabled)
+        self.assertEqual((task.crontab.hour, task.crontab.minute), ("2", "0"))
+
+    def test_fine_amount_matches_session_amount(self):
+        late = self.returned_borrowing(days_late=4)
+        accrue_fines()
+        fine = Payment.objects.get(type=Payment.TypeChoices.FINE)
+
+        self.assertEqual(
+            calculate_days_of_overdue_amount(late),
+            int(fine.money_to_pay * 100),
+        )
@@ -1,5 +1,10 @@
+import json
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework.reverse import reverse
 from rest_framework import status
@@ -8,6 +13,8 @@ from book.models import Book
 from book.serializers import BookListSerializer
 
 BOOKS_URL = reverse("books:book-list")
+IMPORT_URL = reverse("books:book-bulk-import")
+EXPORT_URL = reverse("books:book-export")
 
 
 def detail_url(book_id: int) -> str:
@@ -72,11 +79,61 @@ class AuthenticatedBookApiTest(TestCase):
 
     def test_list_books(self) -> None:
         res = self.client.get(BOOKS_URL)
-        books = Book.objects.all()
+        books = Book.objects.order_by("id")
         serializer = BookListSerializer(books, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_filter_books_by_title_and_author(self) -> None:
+        book = sample_book(title="War and Peace", author="Leo Tolstoy")
+        sample_book(title="Peace Talks", author="Jim Butcher")
+
+        res = self.client.get(BOOKS_URL, {"title": "war", "author": "TOLSTOY"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in res.data["results"]], [book.id])
+
+    def test_search_books_ranked_by_relevance(self) -> None:
+        by_author = sample_book(title="Resurrection", author="Leo Tolstoy")
+        by_title = sample_book(title="Tolstoy: A Russian Life", author="Bartlett")
+        sample_book(title="Peace Talks", author="Jim Butcher")
+
+        res = self.client.get(BOOKS_URL, {"q": "tolstoy"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["id"] for item in res.data["results"]],
+            [by_title.id, by_author.id],
+        )
+
+    def test_search_pages_through_equal_ranks(self) -> None:
+        ids = [
+            sample_book(title="Tolstoy", author=f"Author {index}").id
+            for index in range(5)
+        ]
+
+        res = self.client.get(BOOKS_URL, {"q": "tolstoy", "page_size": 2})
+        found = [item["id"] for item in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            found += [item["id"] for item in res.data["results"]]
+
+        self.assertEqual(found, ids)
+
+    def test_list_books_paginated_by_cursor(self) -> None:
+        for index in range(4):
+            sample_book(title=f"Paged Book {index}")
+        ids = list(Book.objects.order_by("id").values_list("id", flat=True))
+
+        res = self.client.get(BOOKS_URL, {"page_size": 3})
+        first_page = [item["id"] for item in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        second_page = [item["id"] for item in res.data["results"]]
+
+        self.assertEqual(first_page + second_page, ids)
+        self.assertIsNone(res.data["next"])
+        self.assertNotIn("count", res.data)
 
     def test_delete_book_forbidden(self) -> None:
         res = self.client.delete(detail_url(self.book.id))
@@ -96,7 +153,7 @@ class AdminBookApiTest(TestCase):
 
     def test_created_book(self) -> None:
         payload = {
-            "title": "Test Book",
+            "title": "New Book",
             "author": "Test Author",
             "cover": Book.CoverChoices.HARD,
             "inventory": 3,
@@ -106,7 +163,268 @@ class AdminBookApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Book.objects.all().count(), 2)
 
+    def test_create_duplicate_book_rejected(self) -> None:
+        payload = {
+            "title": self.book.title,
+            "author": self.book.author,
+            "cover": Book.CoverChoices.HARD,
+            "inventory": 3,
+            "daily_fee": 1.5,
+        }
+        res = self.client.post(BOOKS_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Book.objects.count(), 1)
+
     def test_auth_delete_book(self) -> None:
         res = self.client.delete(detail_url(self.book.id))
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Book.objects.all().count(), 0)
+
+
+class BookCacheTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.book = sample_book()
+
+    def test_list_served_from_cache(self) -> None:
+        self.client.get(BOOKS_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(BOOKS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", res)
+
+    def test_list_invalidated_on_book_create(self) -> None:
+        self.client.get(BOOKS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_book = sample_book(title="Another Book")
+
+        res = self.client.get(BOOKS_URL)
+
+        ids = [item["id"] for item in res.data["results"]]
+        self.assertIn(new_book.id, ids)
+
+    def test_list_invalidated_after_commit(self) -> None:
+        self.client.get(BOOKS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_book(title="Another Book")
+            res = self.client.get(BOOKS_URL)
+            self.assertEqual(len(res.data["results"]), 1)
+
+        res = self.client.get(BOOKS_URL)
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_list_invalidated_on_book_delete(self) -> None:
+        self.client.get(BOOKS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+
+        res = self.client.get(BOOKS_URL)
+
+        self.assertEqual(res.data["results"], [])
+
+    def test_detail_invalidated_on_inventory_change(self) -> None:
+        self.client.get(detail_url(self.book.id))
+        self.client.get(BOOKS_URL)
+        self.book.inventory = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save(update_fields=["inventory"])
+
+        res = self.client.get(detail_url(self.book.id))
+        self.assertEqual(res.data["inventory"], 0)
+        with self.assertNumQueries(0):
+            self.client.get(BOOKS_URL)
+
+
+class BookConditionalGetTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.book = sample_book()
+
+    def test_detail_has_validators(self) -> None:
+        Book.objects.filter(pk=self.book.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        res = self.client.get(detail_url(self.book.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", res)
+
+    def test_no_last_modified_within_its_second(self) -> None:
+        Book.objects.filter(pk=self.book.pk).update(
+            updated_at=timezone.now() + timedelta(minutes=1)
+        )
+
+        res = self.client.get(detail_url(self.book.id))
+
+        self.assertIn("ETag", res)
+        self.assertNotIn("Last-Modified", res)
+
+    def test_cached_detail_not_modified_since(self) -> None:
+        Book.objects.filter(pk=self.book.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=1)
+        )
+        last_modified = self.client.get(detail_url(self.book.id))[
+            "Last-Modified"
+        ]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                detail_url(self.book.id), HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_not_modified(self) -> None:
+        etag = self.client.get(detail_url(self.book.id))["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                detail_url(self.book.id), HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+
+    def test_detail_modified_after_update(self) -> None:
+        etag = self.client.get(detail_url(self.book.id))["ETag"]
+        self.book.title = "Changed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+
+        res = self.client.get(detail_url(self.book.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_list_has_no_last_modified(self) -> None:
+        res = self.client.get(BOOKS_URL)
+
+        self.assertIn("ETag", res)
+        self.assertNotIn("Last-Modified", res)
+
+    def test_list_not_modified(self) -> None:
+        etag = self.client.get(BOOKS_URL)["ETag"]
+
+        res = self.client.get(BOOKS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified_after_delete(self) -> None:
+        sample_book(title="Another Book")
+        etag = self.client.get(BOOKS_URL)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+
+        res = self.client.get(BOOKS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_modified_after_new_book(self) -> None:
+        etag = self.client.get(BOOKS_URL)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_book(title="Another Book")
+
+        res = self.client.get(BOOKS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class BookImportTest(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="admin@test.com",
+            password="testpassword",
+            is_staff=True,
+        )
+        self.client.force_authenticate(user=self.user)
+        self.book = sample_book(title="Dune", author="Frank Herbert")
+
+    def test_import_csv_upserts_by_title_and_author(self) -> None:
+        body = (
+            "title,author,cover,inventory,daily_fee\n"
+            "Dune,Frank Herbert,Soft,10,2.50\n"
+            "Emma,Jane Austen,Hard,2,1.00\n"
+            "Broken,Nobody,Paper,x,1.00\n"
+        )
+        res = self.client.post(
+            IMPORT_URL, data=body, content_type="text/csv"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["created"], 1)
+        self.assertEqual(res.data["updated"], 1)
+        self.assertEqual(res.data["failed"], 1)
+        self.assertEqual(res.data["errors"][0]["line"], 4)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 10)
+        self.assertTrue(Book.objects.filter(title="Emma").exists())
+
+    def test_import_updates_without_duplicates(self) -> None:
+        body = (
+            "title,author,cover,inventory,daily_fee\n"
+            "Dune,Frank Herbert,Soft,4,2.50\n"
+        )
+
+        for _ in range(2):
+            res = self.client.post(
+                IMPORT_URL, data=body, content_type="text/csv"
+            )
+
+        self.assertEqual((res.data["created"], res.data["updated"]), (0, 1))
+        self.assertEqual(Book.objects.filter(title="Dune").count(), 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.cover, Book.CoverChoices.SOFT)
+
+    def test_import_ndjson(self) -> None:
+        body = (
+            '{"title": "Emma", "author": "Jane Austen", "cover": "Hard",'
+            ' "inventory": 2, "daily_fee": "1.00"}\n'
+            "not json\n"
+        )
+        res = self.client.post(
+            IMPORT_URL, data=body, content_type="application/x-ndjson"
+        )
+
+        self.assertEqual(res.data["created"], 1)
+        self.assertEqual(res.data["errors"][0]["line"], 2)
+
+    def test_import_unsupported_media_type(self) -> None:
+        res = self.client.post(IMPORT_URL, data={}, format="json")
+        self.assertEqual(
+            res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+    def test_export_ndjson(self) -> None:
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        rows = [
+            json.loads(line)
+            for line in b"".join(res.streaming_content).splitlines()
+        ]
+        self.assertEqual(rows[0]["id"], self.book.id)
+        self.assertEqual(rows[0]["daily_fee"], "1.50")
+
+    def test_export_csv(self) -> None:
+        res = self.client.get(EXPORT_URL, {"output": "csv", "title": "dune"})
+
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "title", "author"])
+        self.assertEqual(len(lines), 2)
+
+    def test_export_invalid_output(self) -> None:
+        res = self.client.get(EXPORT_URL, {"output": "xml"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_forbidden_for_regular_user(self) -> None:
+        self.user.is_staff = False
+        self.user.save()
+        res = self.client.post(IMPORT_URL, data="", content_type="text/csv")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,13 +1,23 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from itertools import count
+from unittest import mock
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_celery_beat.models import PeriodicTask
 from rest_framework.test import APIClient
 from rest_framework.reverse import reverse
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 
 from book.models import Book
-from borrowing.models import Borrowing
+from borrowing import outbox, overdue
+from borrowing.models import Borrowing, OutboxEvent
+from borrowing.notifier import get_notifier
 from borrowing.serializers import (
     BorrowingListSerializer,
     BorrowingDetailSerializer,
@@ -15,15 +25,20 @@ from borrowing.serializers import (
 from payment.models import Payment
 
 BORROWING_URL = reverse("borrowing:borrowing-list")
+EXPORT_URL = reverse("borrowing:borrowing-export")
 
 
 def detail_url(book_id: int) -> str:
     return reverse("borrowing:borrowing-detail", args=[book_id])
 
 
+# Title and author are unique together.
+BOOK_NUMBERS = count(1)
+
+
 def sample_book(**params):
     defaults = {
-        "title": "Test Book",
+        "title": f"Test Book {next(BOOK_NUMBERS)}",
         "author": "Test Author",
         "cover": Book.CoverChoices.HARD,
         "inventory": 6,
@@ -80,11 +95,71 @@ class AuthenticatedBorrowingApiTests(TestCase):
 
     def test_borrowing_list(self) -> None:
         res = self.client.get(BORROWING_URL)
-        borrowings = Borrowing.objects.filter(user=self.user)
+        borrowings = Borrowing.objects.filter(user=self.user).order_by(
+            "-borrow_date", "-id"
+        )
         serializer = BorrowingListSerializer(borrowings, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
-        self.assertEqual(len(res.data), borrowings.count())
+        self.assertEqual(res.data["results"], serializer.data)
+        self.assertEqual(len(res.data["results"]), borrowings.count())
+
+    def test_borrowing_list_not_modified(self) -> None:
+        etag = self.client.get(BORROWING_URL)["ETag"]
+
+        res = self.client.get(BORROWING_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.book.title = "Renamed"
+        self.book.save()
+        res = self.client.get(BORROWING_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_borrowing_list_pages_through_ties_without_offset(self) -> None:
+        borrow_dates = [date(2024, 1, 2)] * 4 + [date(2024, 1, 1)] * 3
+        for borrow_date in borrow_dates:
+            sample_borrowing(user=self.user, borrow_date=borrow_date)
+        ids = list(
+            Borrowing.objects.filter(user=self.user)
+            .order_by("-borrow_date", "-id")
+            .values_list("id", flat=True)
+        )
+
+        pages = []
+        url, params = BORROWING_URL, {"page_size": 3, "fields": "id"}
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                res = self.client.get(url, params)
+                pages.append([item["id"] for item in res.data["results"]])
+                url, params = res.data["next"], None
+            previous = self.client.get(res.data["previous"])
+
+        self.assertEqual(sum(pages, []), ids)
+        self.assertEqual(
+            [item["id"] for item in previous.data["results"]], pages[-2]
+        )
+        self.assertFalse(
+            any("OFFSET" in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_borrowing_list_sparse_fields(self) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(BORROWING_URL, {"fields": "id,is_active"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data["results"],
+            [{"id": self.borrowing.id, "is_active": True}],
+        )
+        self.assertNotIn("book_book", queries[-1]["sql"])
+
+    def test_borrowing_list_expand_book(self) -> None:
+        res = self.client.get(
+            BORROWING_URL, {"fields": "id,book", "expand": "book"}
+        )
+
+        book = res.data["results"][0]["book"]
+        self.assertEqual(book["id"], self.book.id)
+        self.assertEqual(book["daily_fee"], "2.00")
 
     def test_borrowing_detail(self) -> None:
         res = self.client.get(detail_url(self.borrowing.id))
@@ -109,6 +184,27 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         self.assertEqual(self.book.inventory, 5)
 
+    def test_borrowing_create_returns_pending_payment(self) -> None:
+        Payment.objects.filter(borrowing__user=self.user).update(status="PAID")
+        payload = {
+            "expected_return": datetime.now().date() + timedelta(days=10),
+            "book": self.book.id,
+        }
+        res = self.client.post(BORROWING_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["payment"]["status"], "PENDING")
+        self.assertEqual(res.data["payment"]["money_to_pay"], "20.00")
+        self.assertIsNone(res.data["payment"]["session_url"])
+        self.assertEqual(
+            set(
+                OutboxEvent.objects.filter(
+                    processed_at__isnull=True
+                ).values_list("kind", flat=True)
+            ),
+            {"PAYMENT_SESSION", "TELEGRAM_MESSAGE"},
+        )
+
     def test_borrowing_create_nor_allowed_if_previous_not_paid(self) -> None:
         payload = {
             "borrow_date": datetime.now().date(),
@@ -139,6 +235,10 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data["detail"], "Borrowing has returned")
 
+    def test_export_forbidden(self) -> None:
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_checking_if_book_is_returned(self) -> None:
         borrowing = sample_borrowing(
             user=self.user,
@@ -149,6 +249,20 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(res.data["detail"], "Your borrowing is already returned")
 
+    async def test_return_book_on_async_stack(self) -> None:
+        borrowing = await sync_to_async(sample_borrowing)(user=self.user)
+        token = AccessToken.for_user(self.user)
+
+        res = await AsyncClient().post(
+            detail_url(borrowing.id) + "return/",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        await borrowing.arefresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(borrowing.actual_return, date.today())
+        self.assertGreater(int(res["X-Query-Count"]), 0)
+
 
 class AdminBorrowingApiTests(TestCase):
     def setUp(self) -> None:
@@ -173,11 +287,11 @@ class AdminBorrowingApiTests(TestCase):
 
     def test_list_all_borrowing(self) -> None:
         res = self.client.get(BORROWING_URL)
-        borrowings = Borrowing.objects.all()
+        borrowings = Borrowing.objects.order_by("-borrow_date", "-id")
         serializer = BorrowingListSerializer(borrowings, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_borrowing_detail_another_user(self) -> None:
         res = self.client.get(detail_url(self.borrowing_1.id))
@@ -185,3 +299,240 @@ class AdminBorrowingApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
+
+    def test_export_all_borrowings(self) -> None:
+        res = self.client.get(EXPORT_URL, {"output": "csv"})
+
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(lines), Borrowing.objects.count() + 1)
+
+    async def test_export_streams_asynchronously_on_async_stack(self) -> None:
+        token = AccessToken.for_user(self.user)
+
+        res = await AsyncClient().get(
+            EXPORT_URL,
+            {"output": "ndjson"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        lines = [line async for line in res.streaming_content]
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.is_async)
+        self.assertEqual(len(lines), await Borrowing.objects.acount())
+
+
+@mock.patch("borrowing.notifier.TelegramNotifier.enqueue")
+@mock.patch("payment.stripe_client.StripeClient.create_session")
+class OutboxDispatchTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com",
+            password="test12345",
+        )
+        self.borrowing = sample_borrowing(user=self.user)
+        self.payment = self.borrowing.payments.get()
+
+    def test_dispatch_opens_session_and_notifies(
+        self, session_create, send_message
+    ) -> None:
+        session_create.return_value = mock.Mock(
+            id="cs_test_1",
+            url="https://stripe.test/cs_test_1",
+            amount_total=2000,
+            expires_at=int(datetime.now().timestamp()) + 3600,
+        )
+
+        self.assertEqual(outbox.dispatch(), 2)
+        self.assertEqual(outbox.dispatch(), 0)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.session_id, "cs_test_1")
+        self.assertIsNotNone(self.payment.expires_at)
+        self.assertEqual(
+            session_create.call_args.kwargs["idempotency_key"],
+            f"payment-{self.payment.id}-2000-new",
+        )
+        session_create.assert_called_once()
+        send_message.assert_called_once()
+
+    def test_failed_event_is_kept_for_retry(
+        self, session_create, send_message
+    ) -> None:
+        session_create.side_effect = ConnectionError("stripe is down")
+
+        self.assertEqual(outbox.dispatch(), 1)
+
+        event = OutboxEvent.objects.get(kind="PAYMENT_SESSION")
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("stripe is down", event.last_error)
+        self.payment.refresh_from_db()
+        self.assertIsNone(self.payment.session_id)
+
+    def test_event_is_claimed_while_handled(
+        self, session_create, send_message
+    ) -> None:
+        OutboxEvent.objects.filter(kind="PAYMENT_SESSION").delete()
+        event = OutboxEvent.objects.get()
+        claims = []
+        send_message.side_effect = lambda text: claims.append(
+            OutboxEvent.objects.get(pk=event.pk).claimed_until
+        )
+
+        self.assertEqual(outbox.dispatch(), 1)
+
+        self.assertGreater(claims[0], timezone.now())
+        event.refresh_from_db()
+        self.assertIsNone(event.claimed_until)
+        self.assertIsNotNone(event.processed_at)
+
+    def test_claimed_events_are_skipped(
+        self, session_create, send_message
+    ) -> None:
+        OutboxEvent.objects.update(
+            claimed_until=timezone.now() + timedelta(minutes=1)
+        )
+
+        self.assertEqual(outbox.dispatch(), 0)
+
+        session_create.assert_not_called()
+        send_message.assert_not_called()
+
+    def test_messages_do_not_need_stripe(
+        self, session_create, send_message
+    ) -> None:
+        OutboxEvent.objects.filter(kind="PAYMENT_SESSION").delete()
+
+        with mock.patch.object(outbox, "get_stripe_client") as client:
+            self.assertEqual(outbox.dispatch(), 1)
+
+        client.assert_not_called()
+        send_message.assert_called_once()
+
+    def test_drain_continues_past_failed_batches(
+        self, session_create, send_message
+    ) -> None:
+        session_create.side_effect = ConnectionError("stripe is down")
+
+        self.assertEqual(outbox.drain(batch_size=1), 1)
+
+        send_message.assert_called_once()
+        event = OutboxEvent.objects.get(kind="PAYMENT_SESSION")
+        self.assertEqual(event.attempts, 1)
+
+    def test_dispatch_is_scheduled_periodically(
+        self, session_create, send_message
+    ) -> None:
+        self.assertTrue(
+            PeriodicTask.objects.filter(
+                task="borrowing.tasks.dispatch_outbox", enabled=True
+            ).exists()
+        )
+
+
+class OverdueQueueTests(TestCase):
+    def setUp(self) -> None:
+        self.today = datetime.now().date()
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"user{index}@test.com", password="test12345"
+            )
+            for index in range(2)
+        ]
+
+    def overdue_borrowing(self, user, title: str) -> Borrowing:
+        return sample_borrowing(
+            user=user,
+            book=sample_book(title=title),
+            borrow_date=self.today - timedelta(days=10),
+            expected_return=self.today - timedelta(days=1),
+        )
+
+    def test_digest_groups_overdue_borrowings_per_user(self) -> None:
+        self.overdue_borrowing(self.users[0], "First")
+        self.overdue_borrowing(self.users[1], "Second")
+        self.overdue_borrowing(self.users[0], "Third")
+        sample_borrowing(user=self.users[1])
+        messages = []
+
+        notified = overdue.notify_overdue_borrowings(send=messages.append)
+
+        self.assertEqual(notified, 3)
+        self.assertEqual(len(messages), 1)
+        lines = messages[0].splitlines()
+        self.assertEqual(lines[0], "Overdue borrowings of user0@test.com:")
+        self.assertIn("First", lines[1])
+        self.assertIn("Third", lines[2])
+        self.assertEqual(lines[3], "Overdue borrowings of user1@test.com:")
+
+    @override_settings(
+        TELEGRAM_TRANSPORT="borrowing.notifier.FakeTransport",
+        TELEGRAM_CHAT_ID="42",
+    )
+    def test_digest_goes_through_notifier_queue(self) -> None:
+        self.overdue_borrowing(self.users[0], "First")
+
+        overdue.notify_overdue_borrowings()
+        get_notifier().flush()
+
+        [(chat_id, text)] = get_notifier().transport.sent
+        self.assertEqual(chat_id, "42")
+        self.assertIn("First", text)
+
+    def test_digest_is_sent_after_the_batch_commits(self) -> None:
+        self.overdue_borrowing(self.users[0], "First")
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        overdue.notify_overdue_borrowings(
+            send=lambda message: depths.append(len(connection.savepoint_ids))
+        )
+
+        self.assertEqual(depths, [depth])
+
+    def test_tick_only_pops_newly_overdue_borrowings(self) -> None:
+        self.overdue_borrowing(self.users[0], "First")
+        messages = []
+
+        overdue.notify_overdue_borrowings(send=messages.append)
+        self.overdue_borrowing(self.users[0], "Second")
+        overdue.notify_overdue_borrowings(send=messages.append)
+        overdue.notify_overdue_borrowings(send=messages.append)
+
+        self.assertEqual(len(messages), 2)
+        self.assertIn("Second", messages[1])
+        self.assertNotIn("First", messages[1])
+
+    def test_new_due_date_requeues_borrowing(self) -> None:
+        borrowing = self.overdue_borrowing(self.users[0], "First")
+        overdue.notify_overdue_borrowings(send=mock.Mock())
+
+        borrowing = Borrowing.objects.get(pk=borrowing.pk)
+        borrowing.expected_return = self.today
+        borrowing.save(update_fields=["expected_return"])
+        borrowing.refresh_from_db()
+        self.assertIsNone(borrowing.overdue_notified_at)
+
+        messages = []
+        overdue.notify_overdue_borrowings(send=messages.append)
+        self.assertEqual(len(messages), 1)
+
+    @mock.patch.object(overdue, "DIGEST_SIZE", 1)
+    def test_failed_send_keeps_borrowings_queued(self) -> None:
+        for title in ("First", "Second", "Third"):
+            self.overdue_borrowing(self.users[0], title)
+        messages = []
+
+        def flaky_send(message):
+            if len(messages) == 1:
+                raise ConnectionError("telegram is down")
+            messages.append(message)
+
+        with self.assertRaises(ConnectionError):
+            overdue.notify_overdue_borrowings(send=flaky_send)
+        overdue.notify_overdue_borrowings(send=messages.append)
+
+        self.assertEqual(len(messages), 3)
+        for message, title in zip(messages, ("First", "Second", "Third")):
+            self.assertIn(title, message)
@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django_celery_beat.models import PeriodicTask
+
+from book.inventory import (
+    disable_striping,
+    enable_striping,
+    release_copy,
+    reserve_copy,
+    sync_striped_inventory,
+)
+from book.models import Book, InventoryStripe
+
+WORKERS = 20
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Test Book",
+        "author": "Test Author",
+        "cover": Book.CoverChoices.HARD,
+        "inventory": 10,
+        "daily_fee": 2,
+    }
+    defaults.update(params)
+
+    return Book.objects.create(**defaults)
+
+
+class InventoryReservationTest(TransactionTestCase):
+    def _reserve_concurrently(self, book_id: int, attempts: int) -> list:
+        def reserve(_):
+            try:
+                return reserve_copy(Book.objects.get(pk=book_id))
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            return list(executor.map(reserve, range(attempts)))
+
+    def test_reserve_and_release(self) -> None:
+        book = sample_book(inventory=1)
+
+        self.assertTrue(reserve_copy(book))
+        self.assertFalse(reserve_copy(book))
+        release_copy(book)
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+    def test_concurrent_reservations_do_not_oversell(self) -> None:
+        book = sample_book()
+
+        results = self._reserve_concurrently(book.id, 30)
+
+        book.refresh_from_db()
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(book.inventory, 0)
+
+    def test_concurrent_reservations_on_striped_book(self) -> None:
+        book = sample_book()
+        enable_striping(book, 4)
+
+        results = self._reserve_concurrently(book.id, 30)
+
+        self.assertEqual(results.count(True), 10)
+        self.assertFalse(
+            InventoryStripe.objects.filter(book=book, available__gt=0).exists()
+        )
+        sync_striped_inventory()
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+    def test_disable_striping_folds_stripes(self) -> None:
+        book = sample_book(inventory=7)
+        enable_striping(book, 3)
+        self.assertTrue(reserve_copy(book))
+
+        disable_striping(book)
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 6)
+        self.assertEqual(book.inventory_stripes, 0)
+        self.assertFalse(InventoryStripe.objects.filter(book=book).exists())
+
+    def test_release_falls_back_when_no_stripe_is_updated(self) -> None:
+        book = sample_book(inventory=4)
+        enable_striping(book, 2)
+        self.assertTrue(reserve_copy(book))
+
+        with mock.patch("book.inventory._update_stripe", return_value=0):
+            release_copy(book)
+
+        sync_striped_inventory()
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 4)
+
+    def test_release_after_striping_was_disabled(self) -> None:
+        book = sample_book(inventory=4)
+        enable_striping(book, 2)
+        self.assertTrue(reserve_copy(book))
+        disable_striping(Book.objects.get(pk=book.pk))
+
+        release_copy(book)
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 4)
+        self.assertEqual(book.inventory_stripes, 0)
+
+    def test_reserve_through_instance_loaded_before_striping(self) -> None:
+        book = sample_book(inventory=2)
+        enable_striping(Book.objects.get(pk=book.pk), 2)
+
+        results = [reserve_copy(book) for _ in range(4)]
+
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(book.inventory_stripes, 2)
+        sync_striped_inventory()
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+    def test_command_switches_striping(self) -> None:
+        book = sample_book(inventory=5)
+
+        call_command(
+            "stripe_inventory", book.id, stripes=2, stdout=StringIO()
+        )
+        book.refresh_from_db()
+        self.assertEqual(book.inventory_stripes, 2)
+        self.assertEqual(
+            sum(InventoryStripe.objects.values_list("available", flat=True)),
+            5,
+        )
+
+        call_command(
+            "stripe_inventory", book.id, disable=True, stdout=StringIO()
+        )
+        book.refresh_from_db()
+        self.assertEqual((book.inventory, book.inventory_stripes), (5, 0))
+
+    def test_command_rejects_unknown_books(self) -> None:
+        with self.assertRaises(CommandError):
+            call_command("stripe_inventory", 0, stripes=2)
+
+
+class InventoryScheduleTest(TestCase):
+    def test_striped_inventory_is_synced_periodically(self) -> None:
+        self.assertTrue(
+            PeriodicTask.objects.filter(
+                task="book.tasks.sync_striped_inventory", enabled=True
+            ).exists()
+        )
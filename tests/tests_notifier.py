@@ -0,0 +1,138 @@
+import json
+from unittest.mock import MagicMock
+
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from borrowing.notifier import (
+    MAX_MESSAGE_LENGTH,
+    FakeTransport,
+    TelegramError,
+    TelegramNotifier,
+    TelegramTransport,
+    TokenBucket,
+    coalesce,
+    get_notifier,
+)
+from borrowing.send_telegram_message import send_telegram_message
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_waits_for_refill(self) -> None:
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 1)
+        self.assertEqual(bucket.reserve(), 2)
+
+        clock.now = 10
+        self.assertEqual(bucket.reserve(), 0)
+
+
+    def test_hold_delays_next_token(self) -> None:
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+
+        bucket.hold(30)
+
+        self.assertEqual(bucket.reserve(), 31)
+
+
+class TelegramTransportTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.transport = TelegramTransport("SECRET123")
+        self.transport.session = MagicMock()
+
+    def response(self, status_code: int, body: dict):
+        response = requests.Response()
+        response.status_code = status_code
+        response.reason = "Error"
+        response._content = json.dumps(body).encode()
+        return response
+
+    def test_errors_do_not_leak_token(self) -> None:
+        self.transport.session.post.side_effect = requests.ConnectionError(
+            "Max retries exceeded with url: /botSECRET123/sendMessage"
+        )
+
+        with self.assertRaises(TelegramError) as raised:
+            self.transport.send(1, "hello")
+
+        error = raised.exception
+        self.assertNotIn("SECRET123", repr(error))
+        self.assertIsNone(error.__cause__)
+        self.assertTrue(error.__suppress_context__)
+
+    def test_rate_limit_reports_retry_after(self) -> None:
+        self.transport.session.post.return_value = self.response(429, {
+            "ok": False,
+            "description": "Too Many Requests: retry after 7",
+            "parameters": {"retry_after": 7},
+        })
+
+        with self.assertRaises(TelegramError) as raised:
+            self.transport.send(1, "hello")
+
+        self.assertEqual(raised.exception.retry_after, 7)
+
+
+class CoalesceTests(SimpleTestCase):
+    def test_merges_messages_per_chat(self) -> None:
+        merged = coalesce([(1, "a"), (2, "b"), (1, "c")])
+
+        self.assertEqual(merged, [(1, "a\n\nc"), (2, "b")])
+
+    def test_respects_message_size_limit(self) -> None:
+        text = "x" * (MAX_MESSAGE_LENGTH // 2)
+
+        merged = coalesce([(1, text), (1, text), (1, "y")])
+
+        self.assertEqual(len(merged), 2)
+        self.assertTrue(
+            all(len(message) <= MAX_MESSAGE_LENGTH for _, message in merged)
+        )
+
+
+class TelegramNotifierTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.transport = FakeTransport()
+        self.notifier = TelegramNotifier(self.transport, chat_id=1, window=0.05)
+
+    def test_enqueue_coalesces_messages(self) -> None:
+        for number in range(3):
+            self.notifier.enqueue(f"message {number}")
+        self.notifier.flush()
+
+        self.assertEqual(
+            self.transport.sent, [(1, "message 0\n\nmessage 1\n\nmessage 2")]
+        )
+
+    def test_send_raises_on_failure(self) -> None:
+        self.transport.fail_next = 1
+
+        with self.assertRaises(TelegramError):
+            self.notifier.send("hello")
+        self.notifier.send("hello")
+
+        self.assertEqual(self.transport.sent, [(1, "hello")])
+
+    @override_settings(
+        TELEGRAM_TRANSPORT="borrowing.notifier.FakeTransport",
+        TELEGRAM_CHAT_ID="42",
+    )
+    def test_send_telegram_message_uses_shared_notifier(self) -> None:
+        send_telegram_message("hello")
+        get_notifier().flush()
+
+        self.assertIs(get_notifier(), get_notifier())
+        self.assertEqual(get_notifier().transport.sent, [("42", "hello")])
@@ -0,0 +1,123 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from book.models import Book
+from book.views import BookViewSet
+from borrowing.models import Borrowing
+from borrowing.views import BorrowingViewSet
+from library_api.query_count import QueryRecorder
+from payment.models import Payment
+from payment.views import PaymentViewSet
+
+
+class QueryBudgetTest(TestCase):
+    """Every list endpoint stays within its view's budget for any page size"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="test12345"
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@test.com", password="test12345"
+        )
+        cache.clear()
+
+    def seed(self, rows: int) -> None:
+        for _ in range(rows):
+            book = Book.objects.create(
+                title=f"Test Book {Book.objects.count()}",
+                author="Test Author",
+                cover=Book.CoverChoices.HARD,
+                inventory=5,
+                daily_fee=2,
+            )
+            Borrowing.objects.create(
+                expected_return=date.today() + timedelta(days=10),
+                book=book,
+                user=self.user,
+            )
+
+    def record(self, url: str, user=None) -> QueryRecorder:
+        cache.clear()
+        self.client.force_authenticate(user)
+        with QueryRecorder() as recorder:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["X-Query-Count"], str(recorder.count))
+        return recorder
+
+    def assertWithinBudget(self, view_class, action, url, user=None) -> None:
+        budget = view_class.query_budgets[action]
+
+        self.seed(1)
+        small = self.record(url, user)
+        self.seed(10)
+        large = self.record(url, user)
+
+        self.assertLessEqual(large.count, budget, large.shapes)
+        self.assertEqual(small.count, large.count, large.shapes)
+        self.assertEqual(large.repeated(), {})
+
+    def test_book_list(self) -> None:
+        self.assertWithinBudget(
+            BookViewSet, "list", reverse("books:book-list")
+        )
+
+    def test_book_list_search(self) -> None:
+        self.assertWithinBudget(
+            BookViewSet, "list", reverse("books:book-list") + "?q=test"
+        )
+
+    def test_borrowing_list(self) -> None:
+        url = reverse("borrowing:borrowing-list")
+        self.assertWithinBudget(BorrowingViewSet, "list", url, self.user)
+
+    def test_borrowing_list_staff(self) -> None:
+        url = reverse("borrowing:borrowing-list")
+        self.assertWithinBudget(BorrowingViewSet, "list", url, self.admin)
+
+    def test_borrowing_list_expand_book(self) -> None:
+        url = reverse("borrowing:borrowing-list") + "?expand=book"
+        self.assertWithinBudget(BorrowingViewSet, "list", url, self.admin)
+
+    def test_borrowing_detail(self) -> None:
+        self.seed(1)
+        borrowing = Borrowing.objects.get()
+        Payment.objects.create(
+            borrowing=borrowing,
+            status=Payment.StatusChoices.PAID,
+            type=Payment.TypeChoices.FINE,
+            money_to_pay=4,
+        )
+        url = reverse("borrowing:borrowing-detail", args=[borrowing.id])
+
+        recorder = self.record(url, self.user)
+
+        self.assertLessEqual(
+            recorder.count, BorrowingViewSet.query_budgets["retrieve"]
+        )
+
+    def test_payment_list(self) -> None:
+        url = reverse("payment:payment-list")
+        self.assertWithinBudget(PaymentViewSet, "list", url, self.user)
+
+    def test_payment_list_staff(self) -> None:
+        url = reverse("payment:payment-list")
+        self.assertWithinBudget(PaymentViewSet, "list", url, self.admin)
+
+    def test_payment_detail(self) -> None:
+        self.seed(1)
+        payment = Payment.objects.get()
+        url = reverse("payment:payment-detail", args=[payment.id])
+
+        recorder = self.record(url, self.user)
+
+        self.assertLessEqual(
+            recorder.count, PaymentViewSet.query_budgets["retrieve"]
+        )
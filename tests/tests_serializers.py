@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from book.models import Book
+from book.serializers import BookListSerializer, BookListValuesSerializer
+from borrowing.models import Borrowing
+from borrowing.serializers import (
+    BorrowingListSerializer,
+    BorrowingListValuesSerializer,
+)
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Test Book",
+        "author": "Test Author",
+        "cover": Book.CoverChoices.HARD,
+        "inventory": 3,
+        "daily_fee": 1.5,
+    }
+    defaults.update(params)
+
+    return Book.objects.create(**defaults)
+
+
+class ValuesSerializerParityTest(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com",
+            password="testpassword",
+        )
+        self.books = [
+            sample_book(title="Dune"),
+            sample_book(title="Emma", author="Jane Austen"),
+        ]
+        today = datetime.now().date()
+        Borrowing.objects.bulk_create([
+            Borrowing(
+                book=self.books[0],
+                user=self.user,
+                daily_fee=self.books[0].daily_fee,
+                expected_return=today + timedelta(days=5),
+            ),
+            Borrowing(
+                book=self.books[1],
+                user=self.user,
+                daily_fee=self.books[1].daily_fee,
+                expected_return=today + timedelta(days=5),
+                actual_return=today,
+            ),
+        ])
+
+    def assert_parity(self, queryset, serializer_class, fast_class) -> None:
+        fast = fast_class()
+        expected = serializer_class(queryset, many=True).data
+        actual = fast.serialize(queryset.values(*fast.lookups))
+
+        self.assertEqual(actual, expected)
+
+    def test_book_list_parity(self) -> None:
+        self.assert_parity(
+            Book.objects.order_by("id"),
+            BookListSerializer,
+            BookListValuesSerializer,
+        )
+
+    def test_borrowing_list_parity(self) -> None:
+        self.assert_parity(
+            Borrowing.objects.order_by("id"),
+            BorrowingListSerializer,
+            BorrowingListValuesSerializer,
+        )
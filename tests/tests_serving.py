@@ -0,0 +1,55 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from library_api import serving
+
+
+class AutotuneWorkersTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.cgroup = Path(tempfile.mkdtemp())
+
+    def write(self, name: str, content: str) -> None:
+        path = self.cgroup / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    @mock.patch("os.sched_getaffinity", return_value=set(range(8)))
+    def test_cpu_quota_of_cgroup_v2(self, _) -> None:
+        self.write("cpu.max", "150000 100000\n")
+
+        self.assertEqual(serving.cpu_limit(self.cgroup), 1.5)
+
+    @mock.patch("os.sched_getaffinity", return_value=set(range(8)))
+    def test_cpu_quota_of_cgroup_v1(self, _) -> None:
+        self.write("cpu/cpu.cfs_quota_us", "200000\n")
+        self.write("cpu/cpu.cfs_period_us", "100000\n")
+
+        self.assertEqual(serving.cpu_limit(self.cgroup), 2)
+
+    @mock.patch("os.sched_getaffinity", return_value=set(range(4)))
+    def test_no_quota_uses_affinity(self, _) -> None:
+        self.write("cpu.max", "max 100000\n")
+
+        self.assertEqual(serving.cpu_limit(self.cgroup), 4)
+
+    def test_memory_limit(self) -> None:
+        self.assertIsNone(serving.memory_limit(self.cgroup))
+
+        self.write("memory.max", "max\n")
+        self.assertIsNone(serving.memory_limit(self.cgroup))
+
+        self.write("memory.max", f"{2 ** 30}\n")
+        self.assertEqual(serving.memory_limit(self.cgroup), 2 ** 30)
+
+    def test_workers_follow_cpus_within_memory(self) -> None:
+        self.assertEqual(serving.autotune_workers(cpus=1.5, memory=0), 2)
+        self.assertEqual(
+            serving.autotune_workers(
+                cpus=8, memory=3 * serving.WORKER_MEMORY
+            ),
+            3,
+        )
+        self.assertEqual(serving.autotune_workers(cpus=0.25, memory=1), 1)
@@ -0,0 +1,139 @@
+import os
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from library_api.throttling import LocalBuckets, RedisBuckets, reset_buckets
+
+BOOK_URL = reverse("books:book-list")
+TOKEN_URL = reverse("user:token_obtain_pair")
+REGISTER_URL = reverse("user:create")
+PAYMENT_SUCCESS_URL = reverse("payment:payment-success")
+REDIS_URL = os.getenv("THROTTLE_REDIS_URL")
+
+
+def throttle_rates(**rates):
+    return override_settings(
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {
+                **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"],
+                **rates,
+            },
+        }
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LocalBucketsTests(SimpleTestCase):
+    def test_bucket_refills_over_time(self) -> None:
+        clock = FakeClock()
+        buckets = LocalBuckets(clock=clock)
+
+        self.assertEqual(buckets.take("key", capacity=2, rate=0.5), 0)
+        self.assertEqual(buckets.take("key", capacity=2, rate=0.5), 0)
+        self.assertEqual(buckets.take("key", capacity=2, rate=0.5), 2)
+
+        clock.now = 1
+        self.assertEqual(buckets.take("key", capacity=2, rate=0.5), 1)
+        self.assertEqual(buckets.take("other", capacity=2, rate=0.5), 0)
+
+        clock.now = 2
+        self.assertEqual(buckets.take("key", capacity=2, rate=0.5), 0)
+
+
+@skipUnless(REDIS_URL, "THROTTLE_REDIS_URL is not set")
+class RedisBucketsTests(SimpleTestCase):
+    def test_bucket_is_shared(self) -> None:
+        first, second = RedisBuckets(REDIS_URL), RedisBuckets(REDIS_URL)
+        first.client.delete("throttle:test")
+
+        self.assertEqual(first.take("throttle:test", 2, 0.01), 0)
+        self.assertEqual(second.take("throttle:test", 2, 0.01), 0)
+        self.assertGreater(first.take("throttle:test", 2, 0.01), 99)
+
+
+class ThrottlingTests(TestCase):
+    def setUp(self) -> None:
+        reset_buckets()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="test12345"
+        )
+
+    def tearDown(self) -> None:
+        reset_buckets()
+
+    @throttle_rates(token="2/min")
+    def test_token_endpoint_has_own_budget(self) -> None:
+        credentials = {"email": "user@test.com", "password": "test12345"}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, credentials)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(TOKEN_URL, credentials)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Half a minute per token, minus the refill during the logins.
+        self.assertIn(res["Retry-After"], ("29", "30"))
+        self.assertEqual(
+            self.client.get(BOOK_URL).status_code, status.HTTP_200_OK
+        )
+
+    @throttle_rates(register="1/min")
+    def test_register_endpoint_has_own_budget(self) -> None:
+        res = self.client.post(
+            REGISTER_URL, {"email": "new@test.com", "password": "test12345"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.post(
+            REGISTER_URL, {"email": "other@test.com", "password": "test12345"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", res)
+
+    @throttle_rates(anon="1/min", user="2/min")
+    def test_users_and_anonymous_clients_have_separate_budgets(self) -> None:
+        self.assertEqual(
+            self.client.get(BOOK_URL).status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(
+            self.client.get(BOOK_URL).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            self.assertEqual(
+                self.client.get(BOOK_URL).status_code, status.HTTP_200_OK
+            )
+        self.assertEqual(
+            self.client.get(BOOK_URL).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    @throttle_rates(anon="1/min")
+    def test_async_views_check_throttles_without_event_loop(self) -> None:
+        with patch("adrf.views.async_to_sync") as async_to_sync:
+            res = self.client.get(PAYMENT_SUCCESS_URL, {"session_id": "x"})
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+            res = self.client.get(PAYMENT_SUCCESS_URL, {"session_id": "x"})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        async_to_sync.assert_not_called()
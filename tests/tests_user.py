@@ -0,0 +1,177 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from library_api.query_count import QueryRecorder
+from user import authentication, provisioning
+from user.provisioning import provision_users
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+BORROWING_URL = reverse("borrowing:borrowing-list")
+ME_URL = reverse("user:manage")
+BULK_CREATE_URL = reverse("user:bulk_create")
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        authentication._local.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="test12345"
+        )
+        res = self.client.post(
+            TOKEN_URL, {"email": "user@test.com", "password": "test12345"}
+        )
+        self.access = res.data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def user_queries(self, url: str = BORROWING_URL) -> int:
+        with QueryRecorder() as recorder:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return sum(
+            'FROM "user_user" WHERE' in shape
+            for shape in recorder.shapes.elements()
+        )
+
+    def test_token_has_email_and_staff_claims(self) -> None:
+        token = AccessToken(self.access)
+
+        self.assertEqual(token["email"], "user@test.com")
+        self.assertFalse(token["is_staff"])
+
+    def test_user_is_resolved_from_cache(self) -> None:
+        self.assertEqual(self.user_queries(), 1)
+        self.assertEqual(self.user_queries(), 0)
+
+        authentication._local.clear()
+        self.assertEqual(self.user_queries(), 0)
+
+    def test_save_invalidates_cached_user(self) -> None:
+        self.user_queries()
+
+        self.user.is_staff = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(self.user_queries(), 1)
+        values = authentication.get_cached_user_values(self.user.id)
+        self.assertTrue(
+            dict(zip(authentication.CACHED_FIELDS, values))["is_staff"]
+        )
+
+    def test_cached_user_is_dropped_on_commit(self) -> None:
+        self.user_queries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+            self.assertEqual(self.user_queries(), 0)
+
+        self.assertEqual(self.user_queries(), 1)
+
+    def test_local_cache_is_bounded(self) -> None:
+        with mock.patch.object(authentication, "LOCAL_MAX_ENTRIES", 2):
+            for user_id in range(1, 4):
+                authentication._set_local(user_id, (user_id,))
+
+        self.assertEqual(list(authentication._local), [2, 3])
+
+    def test_inactive_user_is_rejected(self) -> None:
+        self.user_queries()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        res = self.client.get(BORROWING_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_manage_view_uses_plain_jwt(self) -> None:
+        res = self.client.patch(ME_URL, {"password": "new12345"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new12345"))
+
+
+class BulkCreateUserTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@test.com", password="test12345"
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_bulk_create_csv(self) -> None:
+        body = (
+            "email,password,first_name\n"
+            "first@school.test,secret1,Ann\n"
+            "second@school.test,secret2,\n"
+            "first@school.test,secret3,Ann\n"
+            "admin@test.com,secret4,\n"
+            "not-an-email,secret5,\n"
+        )
+
+        res = self.client.post(
+            BULK_CREATE_URL, data=body, content_type="text/csv"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (res.data["created"], res.data["skipped"], res.data["failed"]),
+            (2, 2, 1),
+        )
+        self.assertEqual(res.data["errors"][0]["line"], 6)
+        user = get_user_model().objects.get(email="first@school.test")
+        self.assertEqual(user.first_name, "Ann")
+        self.assertTrue(user.check_password("secret1"))
+
+    def test_requests_share_one_hashing_pool(self) -> None:
+        self.addCleanup(provisioning.reset_hashing_pool)
+
+        with mock.patch.object(provisioning, "_provision_chunk") as chunk:
+            for line in range(2):
+                self.client.post(
+                    BULK_CREATE_URL,
+                    data=f"email,password\nuser{line}@test.com,secret\n",
+                    content_type="text/csv",
+                )
+
+        first, second = (call.args[2] for call in chunk.call_args_list)
+        self.assertIs(first, second)
+        self.assertIs(first, provisioning.get_hashing_pool())
+
+    def test_provision_reports_progress_per_chunk(self) -> None:
+        records = [
+            (line, {"email": f"user{line}@test.com", "password": "pass1"}, None)
+            for line in range(1, 4)
+        ]
+        progress = []
+
+        provision_users(
+            records,
+            chunk_size=2,
+            workers=2,
+            progress=lambda report: progress.append(report["created"]),
+        )
+
+        self.assertEqual(progress, [2, 3])
+
+    def test_bulk_create_forbidden_for_regular_user(self) -> None:
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="test12345"
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.post(
+            BULK_CREATE_URL, data="", content_type="text/csv"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
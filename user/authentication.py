@@ -0,0 +1,117 @@
+"""JWT authentication that resolves users without a query per request.
+
+``CachedJWTAuthentication`` keeps the columns needed for permission checks
+in a small process-local cache (``AUTH_USER_LOCAL_TTL`` seconds) backed by
+the Django cache (``AUTH_USER_CACHE_TIMEOUT`` seconds). Saving or deleting
+a user drops both entries once the transaction commits (``user.signals``),
+other processes see the change once their local entry expires. The local
+cache holds at most ``LOCAL_MAX_ENTRIES`` users.
+
+The returned user is a deferred instance: reading any other field loads it
+from the database and ``save()`` only writes the cached columns. Views
+that edit the user keep the plain ``JWTAuthentication``.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+# In model field order, as Model.from_db() expects.
+CACHED_FIELDS = ("id", "is_superuser", "is_staff", "is_active", "email")
+LOCAL_MAX_ENTRIES = 10_000
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def _cache_key(user_id) -> str:
+    return f"user:{user_id}:auth"
+
+
+def _get_local(user_id):
+    with _local_lock:
+        entry = _local.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _set_local(user_id, values) -> None:
+    now = time.monotonic()
+    with _local_lock:
+        # Re-inserted, so entries stay ordered by expiry.
+        _local.pop(user_id, None)
+        if len(_local) >= LOCAL_MAX_ENTRIES:
+            _evict_local(now)
+        _local[user_id] = (now + settings.AUTH_USER_LOCAL_TTL, values)
+
+
+def _evict_local(now: float) -> None:
+    """Drop expired entries, and the oldest ones while the cache is full"""
+    for user_id, (expires_at, _) in list(_local.items()):
+        if expires_at > now and len(_local) < LOCAL_MAX_ENTRIES:
+            break
+        del _local[user_id]
+
+
+def get_cached_user_values(user_id):
+    """Return the cached columns of a user, None if there is no such user"""
+    values = _get_local(user_id)
+    if values is None:
+        values = cache.get(_cache_key(user_id))
+    if values is None:
+        values = (
+            get_user_model()
+            .objects.filter(pk=user_id)
+            .values_list(*CACHED_FIELDS)
+            .first()
+        )
+        if values is None:
+            return None
+        cache.set(
+            _cache_key(user_id),
+            values,
+            timeout=settings.AUTH_USER_CACHE_TIMEOUT,
+        )
+    _set_local(user_id, values)
+    return values
+
+
+def invalidate_user(user_id) -> None:
+    cache.delete(_cache_key(user_id))
+    with _local_lock:
+        _local.pop(user_id, None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+
+        values = get_cached_user_values(user_id)
+        if values is None:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            )
+
+        user = get_user_model().from_db(
+            DEFAULT_DB_ALIAS, CACHED_FIELDS, values
+        )
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+        return user
@@ -0,0 +1,14 @@
+"""Password hashing in a process pool.
+
+Spawned workers import this module to unpickle the initializer before
+Django is set up, so it must not import models, DRF or anything that
+needs the app registry at the top level.
+"""
+import os
+
+import django
+
+
+def init_worker() -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_api.settings")
+    django.setup()
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library_api.streaming import CSV, NDJSON, iter_lines, iter_records
+from user.provisioning import CHUNK_SIZE, provision_users
+
+
+class Command(BaseCommand):
+    """Django command that registers users from a CSV or NDJSON file"""
+
+    help = "Register users from a CSV or NDJSON file, skipping taken emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path)
+        parser.add_argument(
+            "--format",
+            choices=[CSV, NDJSON],
+            help="File format, guessed from the extension by default",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Password hashing processes, one per CPU by default",
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        path = options["path"]
+        data_format = options["format"] or (
+            CSV if path.suffix.lower() == ".csv" else NDJSON
+        )
+        if not path.exists():
+            raise CommandError(f"File {path} does not exist")
+
+        with path.open("rb") as stream:
+            report = provision_users(
+                iter_records(iter_lines(stream), data_format),
+                chunk_size=options["chunk_size"],
+                workers=options["workers"],
+                progress=self._write_progress,
+            )
+
+        for error in report["errors"]:
+            self.stderr.write(
+                f"Line {error['line']}: {json.dumps(error['errors'])}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created: {report['created']}, "
+            f"skipped: {report['skipped']}, "
+            f"failed: {report['failed']}"
+        ))
+
+    def _write_progress(self, report: dict) -> None:
+        processed = report["created"] + report["skipped"] + report["failed"]
+        self.stdout.write(f"Processed {processed} rows")
@@ -0,0 +1,155 @@
+"""Bulk registration of users.
+
+Password hashing dominates the cost of creating a user (PBKDF2 is meant to
+be slow), so the hashes of a chunk are computed across a process pool and
+the rows are inserted with a single ``bulk_create``. Requests share one
+pool per process, started on first use. Emails already taken are
+skipped: most are filtered out before hashing, the unique index catches
+the rest.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework import serializers
+
+from library_api.streaming import chunked
+from user.hashing import init_worker
+from user.serializers import UserImportSerializer
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+HASHING_WORKERS = os.cpu_count()
+
+
+def provision_users(
+    records, chunk_size: int = CHUNK_SIZE, workers: int = None, progress=None
+) -> dict:
+    """Create users from ``(line_number, record, error)`` rows.
+
+    Hashes are computed by the shared pool of the process, or by a pool of
+    ``workers`` processes started for this call. ``progress`` is called
+    with the report after every chunk.
+    """
+    if workers is None:
+        return _provision(
+            records, chunk_size, get_hashing_pool(), HASHING_WORKERS, progress
+        )
+    with _start_pool(workers) as pool:
+        return _provision(records, chunk_size, pool, workers, progress)
+
+
+def _provision(records, chunk_size: int, pool, workers: int, progress):
+    report = {"created": 0, "skipped": 0, "failed": 0, "errors": []}
+    for chunk in chunked(records, chunk_size):
+        _provision_chunk(chunk, report, pool, workers)
+        logger.info(
+            "Provisioned users: %(created)s created, "
+            "%(skipped)s skipped, %(failed)s failed",
+            report,
+        )
+        if progress is not None:
+            progress(report)
+    return report
+
+
+def _start_pool(workers: int) -> ProcessPoolExecutor:
+    # Spawned workers share nothing with the parent, which may hold
+    # database connections and threads.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool() -> ProcessPoolExecutor:
+    """Process pool shared by the requests of this process, started lazily"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _start_pool(HASHING_WORKERS)
+        return _pool
+
+
+def reset_hashing_pool() -> None:
+    """Shut the shared pool down, the next call starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _provision_chunk(chunk, report: dict, pool, workers: int) -> None:
+    user_model = get_user_model()
+    validator = UserImportSerializer()
+    users = {}
+
+    for line_number, record, error in chunk:
+        if error is None:
+            try:
+                data = validator.run_validation(record)
+            except serializers.ValidationError as exc:
+                error = exc.detail
+            else:
+                email = user_model.objects.normalize_email(data.pop("email"))
+                if email in users:
+                    report["skipped"] += 1
+                else:
+                    users[email] = data
+                continue
+
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_number, "errors": error})
+
+    existing = set(
+        user_model.objects.filter(email__in=users).values_list(
+            "email", flat=True
+        )
+    )
+    report["skipped"] += len(existing)
+    for email in existing:
+        del users[email]
+    if not users:
+        return
+
+    passwords = [data.pop("password") for data in users.values()]
+    try:
+        hashes = list(
+            pool.map(
+                make_password,
+                passwords,
+                chunksize=max(1, len(passwords) // (workers * 4)),
+            )
+        )
+    except BrokenProcessPool:
+        # A dead worker breaks the pool for good.
+        if pool is _pool:
+            reset_hashing_pool()
+        raise
+    to_create = [
+        user_model(email=email, password=password_hash, **data)
+        for (email, data), password_hash in zip(users.items(), hashes)
+    ]
+    user_model.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    # Rows lost to a concurrent insert of the same email keep the other
+    # password, salted hashes never collide.
+    created = user_model.objects.filter(
+        email__in=users, password__in=[user.password for user in to_create]
+    ).count()
+    report["created"] += created
+    report["skipped"] += len(to_create) - created
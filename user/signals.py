@@ -0,0 +1,15 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from user.authentication import invalidate_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, using, **kwargs):
+    # Dropped before commit, the entry could be refilled with the old row.
+    transaction.on_commit(partial(invalidate_user, instance.pk), using=using)
@@ -1,16 +1,20 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
+
+from user.views import (
+    BulkCreateUserView,
+    CreateUserView,
+    ManageUserView,
     TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView,
 )
 
-from user.views import CreateUserView, ManageUserView
-
 app_name = "user"
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
+    path(
+        "register/bulk/", BulkCreateUserView.as_view(), name="bulk_create"
+    ),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
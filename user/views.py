@@ -1,12 +1,54 @@
-from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, status
+from rest_framework.exceptions import UnsupportedMediaType
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt import views as jwt_views
 
+from library_api.streaming import (
+    format_from_content_type,
+    iter_lines,
+    iter_records,
+)
+from user.provisioning import provision_users
 from user.serializers import UserSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    throttle_scope = "register"
+
+
+class BulkCreateUserView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        summary="Bulk register users",
+        description="Admin can register users (email, password and "
+                    "optionally first_name, last_name) from a streamed CSV "
+                    "or NDJSON body, emails already taken are skipped",
+        request={
+            "text/csv": OpenApiTypes.STR,
+            "application/x-ndjson": OpenApiTypes.STR,
+        },
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    def post(self, request):
+        data_format = format_from_content_type(request.content_type)
+        if data_format is None:
+            raise UnsupportedMediaType(request.content_type)
+
+        stream = request.stream
+        lines = iter_lines(stream) if stream is not None else iter(())
+        report = provision_users(iter_records(lines, data_format))
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class TokenObtainPairView(jwt_views.TokenObtainPairView):
+    throttle_scope = "token"
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):